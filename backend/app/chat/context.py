@@ -0,0 +1,216 @@
+"""
+Context assembly for retrieved chunks.
+
+Chunks of the same document with consecutive `chunk_index` are merged into one section, removing the text the
+splitter repeated between them (`chunk_overlap`), located by their character offsets or, for chunks indexed before
+the offsets were recorded, by matching the end of one chunk with the start of the next. Sections that are near-duplicates of a better ranked one (e.g. the
+same file uploaded twice) are dropped, and the rest are packed best first under `retrieval_context_max_tokens`,
+each labelled with its source so the agent can cite it.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.config import settings
+from app.db.models import CHUNK_ORDER_UNKNOWN
+
+# Shortest repeated text treated as splitter overlap when merging consecutive chunks without offsets.
+MIN_OVERLAP_CHARS = 20
+# Sections that would get fewer tokens than this are left out rather than truncated.
+MIN_SECTION_TOKENS = 50
+
+
+@dataclass
+class ContextSection:
+    document_id: str
+    file_name: str
+    first_chunk: int
+    last_chunk: int
+    text: str
+    # (position in the results of its query, query index), lower is better.
+    rank: tuple[int, int]
+    queries: list[str] = field(default_factory=list)
+    pages: set[int] = field(default_factory=set)
+    # Offset in its page where the last chunk ends, and that page, to splice the next chunk in.
+    char_end: int | None = None
+    last_page: int | None = None
+    # False for a chunk of unknown order, its `chunk_index` does not tell which chunks are next to it.
+    mergeable: bool = True
+
+    @property
+    def label(self) -> str:
+        chunks = f"chunk {self.first_chunk}"
+        if self.last_chunk != self.first_chunk:
+            chunks = f"chunks {self.first_chunk}-{self.last_chunk}"
+        label = f"{self.file_name}, {chunks}"
+        if self.pages:
+            first_page, last_page = min(self.pages) + 1, max(self.pages) + 1
+            label += f", page {first_page}" if first_page == last_page else f", pages {first_page}-{last_page}"
+        return label
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The encoding is downloaded on first use, which fails without network access.
+        logger.warning(f"Token counting falls back to an estimate, the tokenizer could not be loaded: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    return len(encoding.encode(text)) if encoding is not None else len(text) // 4 + 1
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4].rstrip() + " ..."
+    return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip() + " ..."
+
+
+def _offset_overlap(section: ContextSection, metadata: dict) -> int | None:
+    """Characters the next chunk repeats from the end of `section`, from their offsets; `None` without offsets."""
+
+    char_start = metadata.get("char_start")
+    if section.char_end is None or char_start is None:
+        return None
+    if metadata.get("page") != section.last_page:
+        # Pages are split separately, so chunks of different pages never overlap.
+        return 0
+    return max(section.char_end - char_start, 0)
+
+
+def _merge_text(first: str, second: str, overlap: int | None = None) -> str:
+    """
+    Concatenate consecutive chunks, dropping the start of `second` that repeats the end of `first`: `overlap`
+    characters when known, otherwise the longest start of `second` that `first` ends with.
+    """
+
+    if overlap is not None:
+        return first + second[overlap:] if overlap else f"{first}\n{second}"
+    longest = min(len(first), len(second), settings.chunk_overlap * 2)
+    for length in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:length]):
+            return first + second[length:]
+    return f"{first}\n{second}"
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i : i + 3]) for i in range(max(len(words) - 2, 1))}
+
+
+def _near_duplicate_of(shingles: set[tuple[str, ...]], kept: list[set[tuple[str, ...]]]) -> int | None:
+    """Index of the first kept section `shingles` is a near-duplicate of, if any."""
+
+    for index, other in enumerate(kept):
+        if not shingles or not other:
+            continue
+        overlap = len(shingles & other)
+        # Containment rather than Jaccard, so a chunk repeated inside a longer merged section is a duplicate too.
+        if overlap / min(len(shingles), len(other)) >= settings.retrieval_near_duplicate_threshold:
+            return index
+    return None
+
+
+def _sections(results: list[tuple[str, list[Document]]]) -> list[ContextSection]:
+    """Merge the hits of all queries into sections of consecutive chunks, best ranked first."""
+
+    hits: dict[str, tuple[Document, tuple[int, int], list[str]]] = {}
+    for query_index, (query, documents) in enumerate(results):
+        for position, document in enumerate(documents):
+            key = document.id or f"{document.metadata.get('document_id')}:{document.metadata.get('chunk_index')}"
+            if key in hits:
+                hits[key][2].append(query)
+            else:
+                hits[key] = (document, (position, query_index), [query])
+
+    ordered = sorted(
+        hits.values(),
+        key=lambda hit: (str(hit[0].metadata.get("document_id")), hit[0].metadata.get("chunk_index", 0)),
+    )
+    sections: list[ContextSection] = []
+    for document, rank, queries in ordered:
+        metadata = document.metadata
+        document_id, chunk_index = str(metadata.get("document_id")), metadata.get("chunk_index", 0)
+        previous = sections[-1] if sections else None
+        mergeable = not metadata.get(CHUNK_ORDER_UNKNOWN)
+        if (
+            previous is not None
+            and previous.mergeable
+            and mergeable
+            and previous.document_id == document_id
+            and previous.last_chunk + 1 == chunk_index
+        ):
+            previous.text = _merge_text(previous.text, document.page_content, _offset_overlap(previous, metadata))
+            previous.last_chunk = chunk_index
+            previous.rank = min(previous.rank, rank)
+            previous.queries.extend(query for query in queries if query not in previous.queries)
+            section = previous
+        else:
+            section = ContextSection(
+                document_id=document_id,
+                file_name=metadata.get("file_name", "document"),
+                first_chunk=chunk_index,
+                last_chunk=chunk_index,
+                text=document.page_content,
+                rank=rank,
+                queries=list(queries),
+                mergeable=mergeable,
+            )
+            sections.append(section)
+        section.char_end = metadata.get("char_end")
+        section.last_page = metadata.get("page")
+        if isinstance(metadata.get("page"), int):
+            section.pages.add(metadata["page"])
+    return sorted(sections, key=lambda section: section.rank)
+
+
+def assemble_context(results: list[tuple[str, list[Document]]], max_tokens: int | None = None) -> str:
+    """
+    Format the documents retrieved for each query as one context: merged, deduplicated, labelled sections, best
+    first, within `max_tokens` (default `retrieval_context_max_tokens`). Returns an empty string without documents.
+    """
+
+    max_tokens = max_tokens or settings.retrieval_context_max_tokens
+    show_queries = len(results) > 1
+    kept: list[ContextSection] = []
+    kept_shingles: list[set[tuple[str, ...]]] = []
+    for section in _sections(results):
+        shingles = _shingles(section.text)
+        duplicate_of = _near_duplicate_of(shingles, kept_shingles)
+        if duplicate_of is not None:
+            original = kept[duplicate_of]
+            original.queries.extend(query for query in section.queries if query not in original.queries)
+            continue
+        kept.append(section)
+        kept_shingles.append(shingles)
+
+    blocks: list[str] = []
+    used_tokens = 0
+    for number, section in enumerate(kept, start=1):
+        header = f"[{number}] Source: {section.label}"
+        if show_queries:
+            header += f"\nMatched: {'; '.join(section.queries)}"
+        header_tokens = count_tokens(header) + 1
+        text_tokens = count_tokens(section.text)
+        remaining = max_tokens - used_tokens - header_tokens
+        if text_tokens > remaining:
+            if remaining < MIN_SECTION_TOKENS:
+                break
+            section.text = _truncate(section.text, remaining)
+            text_tokens = remaining
+        blocks.append(f"{header}\n{section.text}")
+        used_tokens += header_tokens + text_tokens
+
+    if len(blocks) < len(kept):
+        logger.info(f"Context budget of {max_tokens} tokens reached, left out {len(kept) - len(blocks)} sections.")
+    return "\n\n".join(blocks)
@@ -4,9 +4,10 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
+from loguru import logger
 
-from .prompts import SYSTEM_PROMPT
-from .tools import tools
+from .prompts import NO_DOCUMENTS_PROMPT, SYSTEM_PROMPT
+from .tools import tools, web_tools
 
 
 def create_model(model_name: str, streaming: bool = False) -> BaseChatModel:
@@ -23,15 +24,60 @@ def create_model(model_name: str, streaming: bool = False) -> BaseChatModel:
     return model
 
 
-def build_retrival_graph(checkpointer: BaseCheckpointSaver, model_name: str) -> CompiledStateGraph:
-    """Build a retrieval chain based on the provided model name."""
+def build_retrival_graph(
+    checkpointer: BaseCheckpointSaver,
+    model_name: str,
+    has_documents: bool = True,
+    model: BaseChatModel | None = None,
+) -> CompiledStateGraph:
+    """
+    Build a retrieval chain based on the provided model name, reusing `model` when given.
+    Without documents in the thread, the agent is not offered the document retrieval tool.
+    """
 
-    model = create_model(model_name=model_name)
+    model = model or create_model(model_name=model_name)
     agent = create_react_agent(
         model=model,
-        tools=tools,
-        prompt=SYSTEM_PROMPT,
+        tools=tools if has_documents else web_tools,
+        prompt=SYSTEM_PROMPT if has_documents else SYSTEM_PROMPT + NO_DOCUMENTS_PROMPT,
         checkpointer=checkpointer,
     )
 
     return agent
+
+
+class AgentRegistry:
+    """
+    Chat model clients and compiled agents of the configured `model_names`, built once at startup and shared by
+    all requests, so a chat turn neither compiles a graph nor opens new connections to the model provider.
+    Compiled graphs are stateless, the per-thread state lives in the checkpointer.
+    """
+
+    def __init__(self):
+        self._models: dict[tuple[str, bool], BaseChatModel] = {}
+        self._graphs: dict[tuple[str, bool], CompiledStateGraph] = {}
+
+    def build(self, checkpointer: BaseCheckpointSaver) -> None:
+        self._models.clear()
+        self._graphs.clear()
+        for model_name in settings.model_names:
+            # The agent streams through `astream`, its model does not need `streaming`.
+            self._models[(model_name, False)] = create_model(model_name=model_name)
+            self._models[(model_name, True)] = create_model(model_name=model_name, streaming=True)
+            for has_documents in (True, False):
+                self._graphs[(model_name, has_documents)] = build_retrival_graph(
+                    checkpointer, model_name, has_documents, model=self._models[(model_name, False)]
+                )
+        logger.info(f"✅ Agents built for models: {', '.join(settings.model_names)}")
+
+    def __contains__(self, model_name: str) -> bool:
+        return (model_name, False) in self._models
+
+    def model(self, model_name: str, streaming: bool = False) -> BaseChatModel:
+        return self._models[(model_name, streaming)]
+
+    def graph(self, model_name: str, has_documents: bool = True) -> CompiledStateGraph:
+        return self._graphs[(model_name, has_documents)]
+
+
+agent_registry = AgentRegistry()
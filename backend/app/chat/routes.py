@@ -12,6 +12,7 @@ chat_router = APIRouter()
 
 @chat_router.post("/")
 async def simple_chat_stream(prompt_input: PromptInput):
+    chat_service.check_model_name(prompt_input.model_name)
     return StreamingResponse(
         chat_service.simple_chat_stream(prompt_input),
     )
@@ -3,16 +3,22 @@ from collections.abc import AsyncGenerator, AsyncIterator
 from uuid import UUID
 
 from app.db.checkpointer import get_checkpointer
+from app.db.retrieval_cache import get_corpus_stats
 from fastapi import HTTPException
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 
-from .langgraph_agent import build_retrival_graph, create_model
+from .langgraph_agent import agent_registry
 from .schemas import Message, PromptInput
 
 
+def check_model_name(model_name: str) -> None:
+    if model_name not in agent_registry:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model_name}")
+
+
 async def simple_chat_stream(prompt_input: PromptInput) -> AsyncGenerator:
-    model = create_model(model_name=prompt_input.model_name, streaming=True)
+    model = agent_registry.model(prompt_input.model_name, streaming=True)
     async for chunk in model.astream([HumanMessage(content=prompt_input.prompt)]):
         if content := chunk.content:
             response = {"type": "llm_chunk", "content": str(content)}
@@ -23,9 +29,11 @@ async def chat_stream(thread_id: UUID, prompt_input: PromptInput, user_id: UUID)
     """
     Streams the agent's execution steps and final response.
     """
+    check_model_name(prompt_input.model_name)
     config = RunnableConfig(configurable={"thread_id": str(thread_id), "user_id": str(user_id)})
-    checkpointer = await get_checkpointer()
-    graph = build_retrival_graph(checkpointer, prompt_input.model_name)
+    corpus_stats = await get_corpus_stats(thread_id)
+    has_documents = corpus_stats is not None and corpus_stats.chunk_count > 0
+    graph = agent_registry.graph(prompt_input.model_name, has_documents)
 
     return graph.astream(
         input={"messages": [HumanMessage(content=prompt_input.prompt)], "retry_count": 0},
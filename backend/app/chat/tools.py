@@ -1,5 +1,8 @@
+from uuid import UUID
+
+from app.chat.context import assemble_context
 from app.config import settings
-from app.db.pgvector_utils import vector_store
+from app.db.pgvector_utils import search_documents_in_pgvector_batch
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
@@ -15,22 +18,27 @@ tavily = TavilySearchResults(
 
 
 @tool
-async def retrieve_user_documents(query: str, config: RunnableConfig) -> str:
+async def retrieve_user_documents(queries: list[str], config: RunnableConfig) -> str:
     """
     Use this tool to answer questions about the user's uploaded documents.
     It will automatically retrieve documents relevant to the current user and thread.
+    Pass several queries at once to search different facets of a question in a single call.
     """
     user_id = config["configurable"].get("user_id")  # type: ignore
     thread_id = config["configurable"].get("thread_id")  # type: ignore
     logger.info(f"Retrieving documents for user_id: {user_id} and thread_id: {thread_id}")
 
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3, "filter": {"thread_id": thread_id}})
-    result_docs = await retriever.ainvoke(query)
-
-    if not result_docs:
+    queries = list(dict.fromkeys(query for query in queries if query.strip()))
+    if not queries:
         return "No relevant documents"
+    results = await search_documents_in_pgvector_batch(queries, UUID(thread_id), k=3)
 
-    return "\n\n".join([doc.page_content for doc in result_docs])
+    context = assemble_context(list(zip(queries, results)))
+    if not context:
+        return "No relevant documents"
+    return context
 
 
 tools = [retrieve_user_documents, tavily]
+# Tools of threads without documents, where retrieving them would always come back empty.
+web_tools = [tavily]
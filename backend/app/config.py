@@ -1,12 +1,20 @@
 import logging
 from pathlib import Path
+from typing import Literal
 
 from loguru import logger
-from pydantic import Field, SecretStr
+from pydantic import Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# Output dimensions of well-known embedding models, checked against `embeddings_dimensions`.
+EMBEDDING_MODEL_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
 LOGS_DIR = BASE_DIR / "logs"
 if not LOGS_DIR.exists():
     LOGS_DIR.mkdir()
@@ -32,6 +40,12 @@ class Settings(BaseSettings):
     model_base_url: str | None = None
     embeddings_model_name: str
     embeddings_base_url: str | None = None
+    embeddings_dimensions: int = 3072
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl_seconds: int = 3600
+    query_embedding_cache_persistent: bool = False
+    retrieval_cache_size: int = 1024
+    retrieval_cache_ttl_seconds: int = 600
     token_bearer_url: str
     jwt_secret: str
     jwt_algorithm: str
@@ -42,7 +56,66 @@ class Settings(BaseSettings):
     postgres_user: str
     postgres_password: str
     postgres_database: str
+    checkpointer_pool_min_size: int = 2
+    checkpointer_pool_max_size: int = 20
+    checkpointer_pool_timeout_seconds: float = 30.0
+    checkpointer_pool_max_idle_seconds: float = 600.0
+    checkpointer_pool_reconnect_timeout_seconds: float = 300.0
     pgvector_collection_name: str
+    vector_index_type: Literal["hnsw", "ivfflat", "none"] = "hnsw"
+    vector_index_hnsw_m: int = 16
+    vector_index_hnsw_ef_construction: int = 64
+    vector_index_ivfflat_lists: int = 100
+    vector_index_storage: Literal["auto", "vector", "halfvec", "binary"] = "auto"
+    vector_index_dimensions: int | None = None
+    vector_search_ef_search: int = 40
+    vector_search_probes: int = 10
+    vector_search_iterative_scan: Literal["off", "relaxed_order", "strict_order"] = "off"
+    vector_search_rerank_factor: int = 4
+    hybrid_search: bool = True
+    hybrid_search_candidates: int = 20
+    hybrid_search_rrf_k: int = 60
+    retrieval_window_chunks: int = 1
+    retrieval_context_max_tokens: int = 2000
+    retrieval_near_duplicate_threshold: float = 0.9
+    thread_vector_cache: bool = False
+    thread_vector_cache_max_chunks: int = 5000
+    thread_vector_cache_max_mb: int = 256
+    chunk_partitioning: Literal["none", "hash", "thread"] = "none"
+    chunk_hash_partitions: int = 16
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    parse_max_workers: int = 2
+    parse_pages_per_task: int = 20
+    embedding_batch_size: int = 64
+    embedding_max_concurrency: int = 4
+    embedding_max_retries: int = 5
+    embedding_retry_base_delay_seconds: float = 1.0
+    embedding_retry_max_delay_seconds: float = 30.0
+    upload_dir: Path = BASE_DIR / "uploads"
+    max_upload_size_mb: int = 100
+    max_upload_batch_files: int = 50
+    upload_max_concurrency: int = 8
+    ingestion_worker_concurrency: int = 8
+    ingestion_poll_interval_seconds: float = 2.0
+    ingestion_job_lease_seconds: int = 300
+    ingestion_max_attempts: int = 3
+    gc_interval_seconds: int = 3600
+    gc_batch_size: int = 1000
+    checkpoint_retention: int = 0
+    metrics_enabled: bool = False
+
+    @model_validator(mode="after")
+    def check_embeddings_dimensions(self) -> "Settings":
+        """The chunk table stores vectors of exactly `embeddings_dimensions`, it must match the embedding model."""
+
+        expected = EMBEDDING_MODEL_DIMENSIONS.get(self.embeddings_model_name.split(":")[-1])
+        if expected is not None and expected != self.embeddings_dimensions:
+            raise ValueError(
+                f"EMBEDDINGS_DIMENSIONS is {self.embeddings_dimensions} but {self.embeddings_model_name} "
+                f"returns {expected} dimensions"
+            )
+        return self
 
     @property
     def database_uri(self) -> str:
@@ -54,11 +127,6 @@ class Settings(BaseSettings):
         """Generate PostgreSQL connection string for checkpointer."""
         return f"postgresql://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_database}?sslmode=disable"
 
-    @property
-    def pgvector_connection(self) -> str:
-        """Generate PostgreSQL connection string for PGVector."""
-        return f"postgresql+psycopg://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_database}"
-
     model_config = SettingsConfigDict(env_file=BASE_DIR / ".env", extra="allow")
 
 
@@ -0,0 +1,196 @@
+"""
+Retention of LangGraph checkpoints.
+
+`AsyncPostgresSaver` keeps a checkpoint for every step of every turn, chat history only needs the latest one.
+Threads with more than `checkpoint_retention` checkpoints are pruned down to their latest ones (`1` keeps only the
+latest, like a shallow checkpointer), together with the pending writes of the removed checkpoints and the channel
+blobs that no remaining checkpoint refers to. Each thread is pruned in its own transaction; checkpoints written
+meanwhile are newer than the ones removed and never lose their blobs. The ingestion worker runs it after each
+garbage collection, and the rows and bytes it deleted are added up in `checkpoint_prune_stats`. Disabled by default
+(`checkpoint_retention = 0`), since it deletes the history of existing threads.
+
+    cd backend
+    python -m app.db.checkpoint_retention --dry-run
+    python -m app.db.checkpoint_retention --keep 5
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.db.main import engine
+from app.db.models import CheckpointPruneStats
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+# (thread, namespace) pairs with more checkpoints than `:keep`, served by the primary key of `checkpoints`.
+OVERFULL_THREADS = """
+SELECT thread_id, checkpoint_ns, count(*) - :keep AS prunable
+FROM checkpoints
+GROUP BY thread_id, checkpoint_ns
+HAVING count(*) > :keep
+"""
+
+# Checkpoint IDs are time ordered (UUIDv6), `AsyncPostgresSaver` sorts them the same way.
+OLDEST_KEPT_CHECKPOINT = """
+SELECT checkpoint_id FROM checkpoints
+WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns
+ORDER BY checkpoint_id DESC
+OFFSET :offset LIMIT 1
+"""
+
+# Data-modifying CTEs all see the rows as they were before the statement, hence the explicit `>= :oldest_kept`.
+PRUNE_THREAD = """
+WITH deleted_checkpoints AS (
+    DELETE FROM checkpoints c
+    WHERE c.thread_id = :thread_id AND c.checkpoint_ns = :checkpoint_ns AND c.checkpoint_id < :oldest_kept
+    RETURNING c.checkpoint, pg_column_size(c.*) AS size
+),
+deleted_writes AS (
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = :thread_id AND w.checkpoint_ns = :checkpoint_ns AND w.checkpoint_id < :oldest_kept
+    RETURNING pg_column_size(w.*) AS size
+),
+released_versions AS (
+    SELECT DISTINCT v.key AS channel, v.value AS version
+    FROM deleted_checkpoints d, jsonb_each_text(d.checkpoint->'channel_versions') v
+),
+deleted_blobs AS (
+    DELETE FROM checkpoint_blobs b
+    USING released_versions r
+    WHERE b.thread_id = :thread_id AND b.checkpoint_ns = :checkpoint_ns
+      AND b.channel = r.channel AND b.version = r.version
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints k
+          WHERE k.thread_id = :thread_id AND k.checkpoint_ns = :checkpoint_ns AND k.checkpoint_id >= :oldest_kept
+            AND k.checkpoint->'channel_versions'->>b.channel = b.version
+      )
+    RETURNING pg_column_size(b.*) AS size
+)
+SELECT 'checkpoints' AS table_name, count(*) AS row_count, coalesce(sum(size), 0) AS byte_size
+FROM deleted_checkpoints
+UNION ALL
+SELECT 'checkpoint_writes', count(*), coalesce(sum(size), 0) FROM deleted_writes
+UNION ALL
+SELECT 'checkpoint_blobs', count(*), coalesce(sum(size), 0) FROM deleted_blobs
+"""
+
+
+@dataclass
+class PruneReport:
+    dry_run: bool
+    threads: int = 0
+    rows: dict[str, int] = field(default_factory=dict)
+    # Size of the deleted rows as stored, the space is reused by Postgres after the next vacuum.
+    bytes: dict[str, int] = field(default_factory=dict)
+
+    def add(self, table: str, rows: int, bytes_: int) -> None:
+        self.rows[table] = self.rows.get(table, 0) + rows
+        self.bytes[table] = self.bytes.get(table, 0) + bytes_
+
+    def __str__(self) -> str:
+        verb = "Found" if self.dry_run else "Deleted"
+        tables = ", ".join(
+            f"{table}: {rows} ({self.bytes.get(table, 0) / 1024 / 1024:.1f} MB)" for table, rows in self.rows.items()
+        )
+        return f"{verb} old checkpoints of {self.threads} threads ({tables or 'nothing to prune'})."
+
+
+async def _record_pruned(conn: AsyncConnection, table: str, rows: int, bytes_: int) -> None:
+    statement = insert(CheckpointPruneStats).values(table_name=table, rows_pruned=rows, bytes_pruned=bytes_)
+    await conn.execute(
+        statement.on_conflict_do_update(
+            index_elements=[CheckpointPruneStats.table_name],
+            set_={
+                "rows_pruned": CheckpointPruneStats.rows_pruned + statement.excluded.rows_pruned,
+                "bytes_pruned": CheckpointPruneStats.bytes_pruned + statement.excluded.bytes_pruned,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+async def prune_checkpoints(dry_run: bool = False, keep: int | None = None) -> PruneReport:
+    """
+    Delete (or only count, with `dry_run`) all but the latest `keep` (default `checkpoint_retention`) checkpoints of
+    each thread. Without a retention or before the checkpointer created its tables, nothing is pruned.
+    """
+
+    keep = settings.checkpoint_retention if keep is None else keep
+    report = PruneReport(dry_run=dry_run)
+    if keep <= 0:
+        return report
+    async with engine.connect() as conn:
+        if not await conn.scalar(text("SELECT to_regclass('checkpoints') IS NOT NULL")):
+            return report
+        overfull = (await conn.execute(text(OVERFULL_THREADS), {"keep": keep})).all()
+
+    for thread_id, checkpoint_ns, prunable in overfull:
+        report.threads += 1
+        if dry_run:
+            report.add("checkpoints", prunable, 0)
+            continue
+        params = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        async with engine.begin() as conn:
+            oldest_kept = await conn.scalar(text(OLDEST_KEPT_CHECKPOINT), params | {"offset": keep - 1})
+            if oldest_kept is None:
+                continue
+            result = await conn.execute(text(PRUNE_THREAD), params | {"oldest_kept": oldest_kept})
+            for table, rows, bytes_ in result.all():
+                report.add(table, rows, bytes_)
+                if rows:
+                    # Same transaction as the deletes, so the totals never count a rolled back prune.
+                    await _record_pruned(conn, table, rows, bytes_)
+
+    if report.threads:
+        logger.info(f"Checkpoint pruning{' (dry run)' if dry_run else ''}, keeping {keep} per thread: {report}")
+    return report
+
+
+async def checkpoint_storage() -> dict[str, tuple[int, int]]:
+    """Estimated rows and total size in bytes (indexes and TOAST included) of each checkpoint table."""
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                """
+                SELECT c.relname, greatest(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid)
+                FROM pg_class c
+                WHERE c.oid IN (SELECT to_regclass(table_name) FROM unnest(CAST(:tables AS text[])) AS table_name)
+                """
+            ),
+            {"tables": list(CHECKPOINT_TABLES)},
+        )
+        return {table: (rows, size) for table, rows, size in result}
+
+
+async def pruned_totals() -> dict[str, tuple[int, int]]:
+    """Rows and bytes pruned from each checkpoint table so far, by all workers."""
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(CheckpointPruneStats.table_name, CheckpointPruneStats.rows_pruned, CheckpointPruneStats.bytes_pruned)
+        )
+        return {table: (rows, bytes_) for table, rows, bytes_ in result}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    parser.add_argument("--keep", type=int, default=settings.checkpoint_retention, help="Checkpoints kept per thread")
+    args = parser.parse_args()
+
+    try:
+        print(await prune_checkpoints(dry_run=args.dry_run, keep=args.keep))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,25 +1,46 @@
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from loguru import logger
-from psycopg import AsyncConnection
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 
 from app.config import settings
 
-connection: AsyncConnection | None = None
+pool: AsyncConnectionPool | None = None
 checkpointer: AsyncPostgresSaver | None = None
 
 
-async def create_connection() -> AsyncConnection:
-    global connection
+async def create_pool() -> AsyncConnectionPool:
+    """
+    Open the connection pool of the checkpointer, so concurrent chat streams read and write their checkpoints on
+    separate connections. Connections are checked before being handed out, and the pool keeps trying to reconnect
+    for `checkpointer_pool_reconnect_timeout_seconds` when the database goes away.
+    """
 
-    if connection is not None:
-        return connection
+    global pool
 
-    logger.info("Creating checkpointer connection...")
-    connection_kwargs = {"autocommit": True, "row_factory": dict_row}
-    connection = await AsyncConnection.connect(conninfo=settings.checkpointer_uri, **connection_kwargs)
-    logger.info("✅ Checkpointer connection created successfully")
-    return connection
+    if pool is not None:
+        return pool
+
+    logger.info("Creating checkpointer connection pool...")
+    pool = AsyncConnectionPool(
+        conninfo=settings.checkpointer_uri,
+        min_size=settings.checkpointer_pool_min_size,
+        max_size=settings.checkpointer_pool_max_size,
+        # `AsyncPostgresSaver` needs autocommit and dict rows; prepared statements break behind pgbouncer.
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        name="checkpointer",
+        timeout=settings.checkpointer_pool_timeout_seconds,
+        max_idle=settings.checkpointer_pool_max_idle_seconds,
+        reconnect_timeout=settings.checkpointer_pool_reconnect_timeout_seconds,
+        check=AsyncConnectionPool.check_connection,
+        open=False,
+    )
+    await pool.open(wait=True, timeout=settings.checkpointer_pool_timeout_seconds)
+    logger.info(
+        f"✅ Checkpointer connection pool created successfully ({settings.checkpointer_pool_min_size}-"
+        f"{settings.checkpointer_pool_max_size} connections)"
+    )
+    return pool
 
 
 async def get_checkpointer() -> AsyncPostgresSaver:
@@ -28,18 +49,24 @@ async def get_checkpointer() -> AsyncPostgresSaver:
     if checkpointer is not None:
         return checkpointer
 
-    conn = await create_connection()
-    checkpointer = AsyncPostgresSaver(conn=conn)  # type: ignore
+    checkpointer = AsyncPostgresSaver(conn=await create_pool())  # type: ignore
     await checkpointer.setup()
     logger.info("✅ PostgresCheckpointer initialized successfully")
     return checkpointer
 
 
-async def close_connection() -> None:
-    global connection
+def get_pool_stats() -> dict[str, int] | None:
+    """Size, usage and error counters of the pool, counters only appear once non-zero."""
+
+    return pool.get_stats() if pool is not None else None
+
+
+async def close_pool() -> None:
+    global pool, checkpointer
 
-    if connection is not None:
-        logger.info("Closing checkpointer connection...")
-        await connection.close()
-        logger.info("✅ Checkpointer connection closed successfully")
-        connection = None
+    if pool is not None:
+        logger.info("Closing checkpointer connection pool...")
+        await pool.close()
+        logger.info("✅ Checkpointer connection pool closed successfully")
+        pool = None
+        checkpointer = None
@@ -0,0 +1,156 @@
+"""
+CPU-bound document parsing and splitting.
+
+The functions prefixed with `_parse` run inside a process pool so that large uploads do not block the event loop.
+This module is imported by the pool's child processes, so it deliberately avoids creating database or embedding
+clients.
+"""
+
+import asyncio
+import multiprocessing
+from collections import deque
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
+from langchain_community.document_loaders.base import BaseLoader
+from langchain_core.documents import Document
+from loguru import logger
+from pypdf import PdfReader
+
+from app.config import settings
+
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=settings.chunk_size,
+    chunk_overlap=settings.chunk_overlap,
+    length_function=len,
+    # Character offset of each chunk in its page (or file), stored as `document_chunks.char_start`.
+    add_start_index=True,
+)
+
+
+DOCUMENT_LOADER_MAPPING: dict[str, type[BaseLoader]] = {
+    ".pdf": PyPDFLoader,
+    ".docx": Docx2txtLoader,
+    ".txt": TextLoader,
+}
+
+allowd_extensions = list(DOCUMENT_LOADER_MAPPING.keys())
+
+
+@dataclass
+class SplitWindow:
+    """The chunks of a window of consecutive pages (a whole DOCX or TXT file counts as one page)."""
+
+    splits: list[Document]
+    pages: int
+    pages_total: int
+
+
+_parse_executor: ProcessPoolExecutor | None = None
+
+
+def get_parse_executor() -> Executor | None:
+    """
+    Return the shared parsing process pool.
+    `None` (the loop's default thread pool) is returned when `parse_max_workers` is 0.
+    """
+    global _parse_executor
+
+    if settings.parse_max_workers <= 0:
+        return None
+    if _parse_executor is None:
+        logger.info(f"Starting document parsing pool with {settings.parse_max_workers} processes...")
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=settings.parse_max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_executor
+
+
+def shutdown_parse_executor() -> None:
+    global _parse_executor
+
+    if _parse_executor is not None:
+        logger.info("Shutting down document parsing pool...")
+        _parse_executor.shutdown(cancel_futures=True)
+        _parse_executor = None
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def _parse_pdf_pages(file_path: str, start: int, stop: int) -> list[Document]:
+    """Extract and split the pages `[start, stop)` of a PDF, with the same metadata `PyPDFLoader` produces."""
+
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    pages = [
+        Document(
+            page_content=reader.pages[page].extract_text(),
+            metadata={
+                "source": file_path,
+                "total_pages": total_pages,
+                "page": page,
+                "page_label": reader.page_labels[page],
+            },
+        )
+        for page in range(start, stop)
+    ]
+    return text_splitter.split_documents(pages)
+
+
+def _parse_file(file_path: str) -> list[Document]:
+    loader = DOCUMENT_LOADER_MAPPING[Path(file_path).suffix.lower()](file_path)  # type: ignore
+    return text_splitter.split_documents(loader.load())
+
+
+async def iter_split_windows(file_path: Path) -> AsyncIterator[SplitWindow]:
+    """
+    Load and split a document off the event loop, yielding its chunks window by window in page order.
+
+    PDFs are cut into windows of `parse_pages_per_task` pages, parsed in parallel with at most `parse_max_workers`
+    windows read ahead, so only a bounded number of pages is held in memory whatever the document size.
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+
+    file_extension = file_path.suffix.lower()
+    if file_extension not in DOCUMENT_LOADER_MAPPING:
+        raise ValueError(f"Unsupported file type: {file_extension}, Allowed types: {', '.join(allowd_extensions)}")
+
+    loop = asyncio.get_running_loop()
+    executor = get_parse_executor()
+    if file_extension != ".pdf":
+        yield SplitWindow(
+            splits=await loop.run_in_executor(executor, _parse_file, str(file_path)), pages=1, pages_total=1
+        )
+        return
+
+    total_pages = await loop.run_in_executor(executor, _count_pdf_pages, str(file_path))
+    window = settings.parse_pages_per_task
+    read_ahead = max(settings.parse_max_workers, 1)
+    in_flight: deque[tuple[int, asyncio.Future[list[Document]]]] = deque()
+    try:
+        for start in range(0, total_pages, window):
+            stop = min(start + window, total_pages)
+            future = loop.run_in_executor(executor, _parse_pdf_pages, str(file_path), start, stop)
+            in_flight.append((stop - start, future))
+            if len(in_flight) >= read_ahead:
+                pages, future = in_flight.popleft()
+                yield SplitWindow(splits=await future, pages=pages, pages_total=total_pages)
+        while in_flight:
+            pages, future = in_flight.popleft()
+            yield SplitWindow(splits=await future, pages=pages, pages_total=total_pages)
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+
+async def load_and_split_document(file_path: Path) -> list[Document]:
+    """Load and split a whole document off the event loop."""
+    return [split async for window in iter_split_windows(file_path) for split in window.splits]
@@ -0,0 +1,249 @@
+"""
+Embedding caches.
+
+Chunk vectors are persisted, keyed by (embedding model name, sha256 of the chunk text) and stored as packed float32,
+so re-uploading the same content only pays for the chunks that were never embedded before.
+
+Query vectors are kept in an in-process LRU cache with a TTL, keyed by (embedding model name, normalized query), so
+repeated or retried questions skip the round trip to the embeddings provider. With `query_embedding_cache_persistent`
+they are also stored in the `embedding_cache` table, under the model name suffixed with `QUERY_MODEL_SUFFIX`, and
+shared between the API processes.
+"""
+
+import asyncio
+import hashlib
+import re
+import unicodedata
+from array import array
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.db.lru_cache import LRUCache
+from app.db.main import async_session
+from app.db.models import EmbeddingCacheEntry
+
+EmbedFunction = Callable[[list[str]], Awaitable[list[list[float]]]]
+EmbedQueryFunction = Callable[[str], Awaitable[list[float]]]
+
+QUERY_MODEL_SUFFIX = "#query"
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+stats = EmbeddingCacheStats()
+query_stats = EmbeddingCacheStats()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> list[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+async def get_cached_embeddings(model_name: str, hashes: list[str]) -> dict[str, list[float]]:
+    """Bulk lookup of cached vectors, returned by content hash."""
+
+    if not hashes:
+        return {}
+    statement = select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+        EmbeddingCacheEntry.model_name == model_name, EmbeddingCacheEntry.content_hash.in_(hashes)
+    )
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return {row.content_hash: _unpack(row.embedding) for row in result}
+
+
+async def put_cached_embeddings(model_name: str, vectors: dict[str, list[float]]) -> None:
+    if not vectors:
+        return
+    statement = (
+        insert(EmbeddingCacheEntry)
+        .values(
+            [
+                {"model_name": model_name, "content_hash": hash_, "embedding": _pack(vector)}
+                for hash_, vector in vectors.items()
+            ]
+        )
+        .on_conflict_do_nothing()
+    )
+    async with async_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def embed_with_cache(model_name: str, texts: list[str], embed: EmbedFunction) -> tuple[list[list[float]], int]:
+    """
+    Embed `texts`, calling `embed` only for texts missing from the cache.
+    Returns the vectors (in the order of `texts`) and the number of texts served from the cache.
+    """
+
+    hashes = [content_hash(text) for text in texts]
+    vectors = await get_cached_embeddings(model_name, list(set(hashes)))
+    cached = sum(1 for hash_ in hashes if hash_ in vectors)
+
+    misses = {hash_: text for hash_, text in zip(hashes, texts) if hash_ not in vectors}
+    if misses:
+        new_vectors = dict(zip(misses.keys(), await embed(list(misses.values()))))
+        try:
+            await put_cached_embeddings(model_name, new_vectors)
+        except Exception as e:
+            logger.warning(f"Failed to store {len(new_vectors)} embeddings in the cache: {e}")
+        vectors.update(new_vectors)
+
+    stats.hits += cached
+    stats.misses += len(texts) - cached
+    return [vectors[hash_] for hash_ in hashes], cached
+
+
+def normalize_query(query: str) -> str:
+    """Unicode-normalized query with collapsed whitespace, so trivially different queries share a key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip()
+
+
+query_cache: LRUCache[tuple[str, str], list[float]] = LRUCache(
+    settings.query_embedding_cache_size, settings.query_embedding_cache_ttl_seconds
+)
+# Embeddings in flight by key, concurrent identical queries wait for the first one instead of embedding it again.
+_pending_queries: dict[tuple[str, str], asyncio.Future[list[float]]] = {}
+
+
+class _QueryEmbeddingAbandoned(Exception):
+    """Set on a pending query embedding whose caller was cancelled, its waiters embed the query themselves."""
+
+
+async def _get_persisted_query_embeddings(model_name: str, hashes: list[str]) -> dict[str, list[float]]:
+    statement = select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+        EmbeddingCacheEntry.model_name == model_name + QUERY_MODEL_SUFFIX,
+        EmbeddingCacheEntry.content_hash.in_(hashes),
+        EmbeddingCacheEntry.created_at >= func.now() - timedelta(seconds=settings.query_embedding_cache_ttl_seconds),
+    )
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return {row.content_hash: _unpack(row.embedding) for row in result}
+
+
+async def _put_persisted_query_embeddings(model_name: str, vectors: dict[str, list[float]]) -> None:
+    statement = insert(EmbeddingCacheEntry).values(
+        [
+            {"model_name": model_name + QUERY_MODEL_SUFFIX, "content_hash": hash_, "embedding": _pack(vector)}
+            for hash_, vector in vectors.items()
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[EmbeddingCacheEntry.model_name, EmbeddingCacheEntry.content_hash],
+        set_={"embedding": statement.excluded.embedding, "created_at": func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def _embed_queries(model_name: str, queries: dict[str, str], embed: EmbedFunction) -> dict[str, list[float]]:
+    """Vectors of `queries` (by content hash) from the persistent cache, or else from `embed` in one call."""
+
+    vectors: dict[str, list[float]] = {}
+    if settings.query_embedding_cache_persistent:
+        try:
+            vectors = await _get_persisted_query_embeddings(model_name, list(queries))
+        except Exception as e:
+            logger.warning(f"Failed to read the query embedding cache: {e}")
+    query_stats.hits += len(vectors)
+
+    misses = {hash_: query for hash_, query in queries.items() if hash_ not in vectors}
+    if not misses:
+        return vectors
+    query_stats.misses += len(misses)
+    new_vectors = dict(zip(misses.keys(), await embed(list(misses.values()))))
+    if settings.query_embedding_cache_persistent:
+        try:
+            await _put_persisted_query_embeddings(model_name, new_vectors)
+        except Exception as e:
+            logger.warning(f"Failed to store {len(new_vectors)} query embeddings in the cache: {e}")
+    return vectors | new_vectors
+
+
+async def embed_queries_with_cache(model_name: str, queries: list[str], embed: EmbedFunction) -> list[list[float]]:
+    """
+    Embed several search queries, those in neither cache with a single `embed` call.
+    Returns the vectors in the order of `queries`.
+    """
+
+    keys = [(model_name, normalize_query(query)) for query in queries]
+    vectors: dict[tuple[str, str], list[float]] = {}
+    for key in keys:
+        vector = query_cache.get(key)
+        if vector is not None:
+            vectors[key] = vector
+    query_stats.hits += len(vectors)
+
+    missing = {content_hash(key[1]): key for key in keys if key not in vectors}
+    if missing:
+        new_vectors = await _embed_queries(model_name, {hash_: key[1] for hash_, key in missing.items()}, embed)
+        for hash_, key in missing.items():
+            vectors[key] = new_vectors[hash_]
+            query_cache.put(key, new_vectors[hash_])
+    return [vectors[key] for key in keys]
+
+
+async def embed_query_with_cache(model_name: str, query: str, embed: EmbedQueryFunction) -> list[float]:
+    """Embed a search query, calling `embed` only when the normalized query is in neither cache."""
+
+    normalized = normalize_query(query)
+    key = (model_name, normalized)
+    vector = query_cache.get(key)
+    if vector is not None:
+        query_stats.hits += 1
+        return vector
+
+    pending = _pending_queries.get(key)
+    if pending is not None:
+        try:
+            vector = await asyncio.shield(pending)
+        except _QueryEmbeddingAbandoned:
+            return await embed_query_with_cache(model_name, query, embed)
+        query_stats.hits += 1
+        return vector
+
+    future = asyncio.get_running_loop().create_future()
+    _pending_queries[key] = future
+    try:
+        hash_ = content_hash(normalized)
+
+        async def embed_one(queries: list[str]) -> list[list[float]]:
+            return [await embed(queries[0])]
+
+        vector = (await _embed_queries(model_name, {hash_: normalized}, embed_one))[hash_]
+    except BaseException as e:
+        # Not `future.cancel()`: the waiters were not cancelled, they retry instead of failing with this caller.
+        future.set_exception(_QueryEmbeddingAbandoned() if isinstance(e, asyncio.CancelledError) else e)
+        # Retrieved here so an exception nobody else waited for is not logged as never retrieved.
+        future.exception()
+        raise
+    finally:
+        _pending_queries.pop(key, None)
+    future.set_result(vector)
+    query_cache.put(key, vector)
+    return vector
@@ -0,0 +1,155 @@
+"""
+Garbage collection of rows and files left behind by deleted threads, documents and users.
+
+Checkpoints of missing threads, expired query embeddings and upload files no active ingestion job refers to are
+deleted in bounded batches, each batch in its own short transaction. Chunk rows are not handled here, the foreign
+keys of `document_chunks` remove them together with their document, thread or user; only the empty partitions of
+deleted threads are dropped.
+
+    cd backend
+    python -m app.db.gc --dry-run
+    python -m app.db.gc --batch-size 500
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+from sqlalchemy import select, text
+
+from app.config import settings
+from app.db.embedding_cache import QUERY_MODEL_SUFFIX
+from app.db.main import async_session, engine
+from app.db.models import IngestionJob, IngestionJobStatus
+from app.db.partitioning import drop_partition, orphan_thread_partitions
+
+# Table -> condition on the row alias `x` that makes the row an orphan.
+ORPHAN_CONDITIONS: dict[str, str] = {
+    "checkpoints": "NOT EXISTS (SELECT 1 FROM threads t WHERE CAST(t.id AS text) = x.thread_id)",
+    "checkpoint_blobs": "NOT EXISTS (SELECT 1 FROM threads t WHERE CAST(t.id AS text) = x.thread_id)",
+    "checkpoint_writes": "NOT EXISTS (SELECT 1 FROM threads t WHERE CAST(t.id AS text) = x.thread_id)",
+    # Expired query embeddings, chunk embeddings are kept for re-uploads.
+    "embedding_cache": (
+        f"x.model_name LIKE '%{QUERY_MODEL_SUFFIX}' "
+        f"AND x.created_at < now() - make_interval(secs => {settings.query_embedding_cache_ttl_seconds})"
+    ),
+}
+
+
+@dataclass
+class GarbageReport:
+    dry_run: bool
+    rows: dict[str, int] = field(default_factory=dict)
+    partitions: int = 0
+    upload_files: int = 0
+    upload_bytes: int = 0
+
+    def __str__(self) -> str:
+        verb = "Found" if self.dry_run else "Deleted"
+        tables = ", ".join(f"{table}: {count}" for table, count in self.rows.items()) or "no tables"
+        return (
+            f"{verb} orphans ({tables}), {self.partitions} chunk partitions and {self.upload_files} upload files "
+            f"({self.upload_bytes / 1024 / 1024:.1f} MB)."
+        )
+
+
+async def _existing_tables() -> list[str]:
+    async with engine.connect() as conn:
+        return [
+            table
+            for table in ORPHAN_CONDITIONS
+            if await conn.scalar(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table})
+        ]
+
+
+async def _count_orphans(table: str) -> int:
+    statement = text(f"SELECT count(*) FROM {table} x WHERE {ORPHAN_CONDITIONS[table]}")
+    async with engine.connect() as conn:
+        return await conn.scalar(statement) or 0
+
+
+async def _delete_orphans(table: str, batch_size: int) -> int:
+    """Delete the orphans of `table`, at most `batch_size` rows per transaction. Returns the number of deleted rows."""
+
+    statement = text(
+        f"""
+        DELETE FROM {table}
+        WHERE ctid = ANY(ARRAY(SELECT x.ctid FROM {table} x WHERE {ORPHAN_CONDITIONS[table]} LIMIT :batch_size))
+        """
+    )
+    params = {"batch_size": batch_size}
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(statement, params)
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+async def _orphan_upload_files() -> list[Path]:
+    """
+    Upload files that no pending or running ingestion job refers to.
+    Recent files are skipped, an upload is stored before its ingestion job is created.
+    """
+
+    if not settings.upload_dir.exists():
+        return []
+    async with async_session() as session:
+        result = await session.execute(
+            select(IngestionJob.file_path).where(
+                IngestionJob.status.in_([IngestionJobStatus.PENDING, IngestionJobStatus.RUNNING])
+            )
+        )
+        active_paths = {Path(file_path).name for file_path in result.scalars()}
+    min_age = time.time() - settings.ingestion_job_lease_seconds
+    return [
+        path
+        for path in settings.upload_dir.iterdir()
+        if path.is_file() and path.name not in active_paths and path.stat().st_mtime < min_age
+    ]
+
+
+async def collect_garbage(dry_run: bool = False, batch_size: int | None = None) -> GarbageReport:
+    """Delete (or only count, with `dry_run`) orphan checkpoints, chunk partitions and upload files."""
+
+    batch_size = batch_size or settings.gc_batch_size
+    report = GarbageReport(dry_run=dry_run)
+    for table in await _existing_tables():
+        if dry_run:
+            report.rows[table] = await _count_orphans(table)
+        else:
+            report.rows[table] = await _delete_orphans(table, batch_size)
+
+    async with engine.begin() as conn:
+        for partition in await orphan_thread_partitions(conn):
+            if dry_run or await drop_partition(conn, partition):
+                report.partitions += 1
+
+    for path in await _orphan_upload_files():
+        report.upload_files += 1
+        report.upload_bytes += path.stat().st_size
+        if not dry_run:
+            path.unlink(missing_ok=True)
+
+    logger.info(f"Garbage collection{' (dry run)' if dry_run else ''}: {report}")
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    parser.add_argument("--batch-size", type=int, default=settings.gc_batch_size, help="Rows deleted per transaction")
+    args = parser.parse_args()
+
+    try:
+        print(await collect_garbage(dry_run=args.dry_run, batch_size=args.batch_size))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
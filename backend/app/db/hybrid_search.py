@@ -0,0 +1,84 @@
+"""
+Hybrid lexical + vector retrieval.
+
+Embeddings are good at paraphrases but miss exact identifiers (invoice numbers, clause IDs, error codes), which
+full-text search on `document_chunks.content_tsv` finds. Both searches run in a single statement, each taking its
+`hybrid_search_candidates` best chunks of the thread, and their rankings are fused with reciprocal rank fusion:
+a chunk scores `1 / (hybrid_search_rrf_k + rank)` summed over the rankings it appears in.
+"""
+
+from uuid import UUID
+
+from sqlalchemy import ColumnElement, Float, Select, Text, and_, cast, func, literal, literal_column, select
+
+from app.config import settings
+from app.db.models import TEXT_SEARCH_CONFIG, DocumentChunk
+from app.db.vector_index import nearest_chunks_statement
+
+
+def lexical_query(query: str) -> ColumnElement:
+    """
+    A `tsquery` matching chunks that contain any of the words of `query`, rather than all of them like
+    `plainto_tsquery` does, since questions rarely share all their words with the chunk that answers them.
+    """
+
+    config = literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig")
+    return func.to_tsquery(config, func.replace(cast(func.plainto_tsquery(config, query), Text), " & ", " | "))
+
+
+def hybrid_chunks_statement(
+    query: str, query_embedding: list[float], k: int, thread_id: UUID, name: str = ""
+) -> Select[tuple[DocumentChunk, float]]:
+    """
+    The `k` chunks of a thread with the best fused rank for `query`, with their RRF score, best first.
+    `name` prefixes the CTE names, for several searches in a statement.
+    """
+
+    candidates = max(k, settings.hybrid_search_candidates)
+    nearest = nearest_chunks_statement(query_embedding, candidates, thread_id=thread_id, name=name).subquery(
+        f"{name}nearest"
+    )
+    semantic = select(
+        nearest.c.id,
+        nearest.c.thread_id,
+        func.row_number().over(order_by=nearest.c.distance).label("rank"),
+    ).cte(f"{name}semantic")
+
+    ts_query = lexical_query(query)
+    text_rank = func.ts_rank_cd(DocumentChunk.content_tsv, ts_query)
+    lexical = (
+        select(
+            DocumentChunk.id,
+            DocumentChunk.thread_id,
+            func.row_number().over(order_by=text_rank.desc()).label("rank"),
+        )
+        .where(DocumentChunk.thread_id == thread_id, DocumentChunk.content_tsv.op("@@")(ts_query))
+        .order_by(text_rank.desc())
+        .limit(candidates)
+        .cte(f"{name}lexical")
+    )
+
+    def rrf(rank: ColumnElement) -> ColumnElement[float]:
+        return func.coalesce(1.0 / (literal(settings.hybrid_search_rrf_k, Float) + rank), 0.0)
+
+    fused = (
+        select(
+            func.coalesce(semantic.c.id, lexical.c.id).label("id"),
+            func.coalesce(semantic.c.thread_id, lexical.c.thread_id).label("thread_id"),
+            (rrf(semantic.c.rank) + rrf(lexical.c.rank)).label("score"),
+        )
+        .select_from(
+            semantic.join(
+                lexical,
+                and_(semantic.c.id == lexical.c.id, semantic.c.thread_id == lexical.c.thread_id),
+                full=True,
+            )
+        )
+        .cte(f"{name}fused")
+    )
+    return (
+        select(DocumentChunk, fused.c.score)
+        .join(fused, and_(DocumentChunk.id == fused.c.id, DocumentChunk.thread_id == fused.c.thread_id))
+        .order_by(fused.c.score.desc())
+        .limit(k)
+    )
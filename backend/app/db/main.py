@@ -3,10 +3,14 @@ from typing import Annotated
 
 from fastapi import Depends
 from loguru import logger
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
+from app.db.migrations import run_migrations
 from app.db.models import Base
+from app.db.partitioning import ensure_chunk_partitions, set_aside_mismatched_chunk_table
+from app.db.vector_index import ensure_vector_index
 
 engine: AsyncEngine = create_async_engine(url=settings.database_uri)
 async_session: async_sessionmaker[AsyncSession] = async_sessionmaker(engine, expire_on_commit=False)
@@ -23,5 +27,10 @@ SessionDep = Annotated[AsyncSession, Depends(get_session)]
 async def init_db() -> None:
     logger.info("Creating tables if not exist...")
     async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await set_aside_mismatched_chunk_table(conn)
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_chunk_partitions(conn)
         logger.info("✅ Database tables created successfully")
+        await run_migrations(conn)
+    await ensure_vector_index(engine)
@@ -0,0 +1,133 @@
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.db.models import CHUNK_ORDER_UNKNOWN, TEXT_SEARCH_CONFIG
+
+# `Base.metadata.create_all` only creates missing tables, so columns added to existing tables are listed here.
+# Every statement must be idempotent, they run on each startup.
+SCHEMA_MIGRATIONS: list[str] = [
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS chunks_cached INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS pages_total INTEGER",
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS pages_parsed INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS index_signature VARCHAR(255)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+    "ALTER TABLE threads ADD COLUMN IF NOT EXISTS corpus_version INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE threads ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0",
+    (
+        "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR "
+        f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED"
+    ),
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv ON document_chunks USING gin (content_tsv)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS char_start INTEGER",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS char_end INTEGER",
+]
+
+
+# Chunks used to live in the `langchain_pg_embedding` table of PGVector, with their IDs in the JSONB metadata.
+# Rows of the configured collection whose document still exists are copied to `document_chunks`, then only the rows
+# found in `document_chunks` are removed; the others (missing document, other dimensions) are kept and reported.
+# Chunks without a `chunk_index` are numbered by page and `start_index` (the splitter's offset in the page); the ID
+# is random, so chunks with neither `chunk_index` nor `start_index` are flagged as of unknown order.
+LEGACY_CHUNKS_MIGRATION = f"""
+INSERT INTO document_chunks
+    (id, user_id, thread_id, document_id, chunk_index, char_start, char_end, content, chunk_metadata, embedding)
+SELECT CAST(e.id AS uuid), t.user_id, t.id, d.id,
+       coalesce(
+           CAST(e.cmetadata->>'chunk_index' AS integer),
+           row_number() OVER (
+               PARTITION BY d.id
+               ORDER BY CAST(e.cmetadata->>'page' AS integer) NULLS FIRST,
+                        CAST(e.cmetadata->>'start_index' AS integer),
+                        e.id
+           ) - 1
+       ),
+       CAST(e.cmetadata->>'start_index' AS integer),
+       CAST(e.cmetadata->>'start_index' AS integer) + length(coalesce(e.document, '')),
+       coalesce(e.document, ''),
+       (e.cmetadata - 'id' - 'chunk_index' - 'start_index' - 'document_id' - 'thread_id' - 'user_id')
+       || CASE
+              WHEN e.cmetadata->>'chunk_index' IS NULL AND e.cmetadata->>'start_index' IS NULL
+              THEN jsonb_build_object('{CHUNK_ORDER_UNKNOWN}', true)
+              ELSE CAST('{{}}' AS jsonb)
+          END,
+       e.embedding
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+JOIN documents d ON CAST(d.id AS text) = e.cmetadata->>'document_id'
+JOIN threads t ON t.id = d.thread_id
+WHERE c.name = :collection_name AND vector_dims(e.embedding) = :dimensions
+ON CONFLICT DO NOTHING
+"""
+
+LEGACY_CHUNKS_CLEANUP = """
+DELETE FROM langchain_pg_embedding e
+USING langchain_pg_collection c
+WHERE c.uuid = e.collection_id AND c.name = :collection_name
+  AND EXISTS (SELECT 1 FROM document_chunks dc WHERE CAST(dc.id AS text) = e.id)
+"""
+
+LEGACY_CHUNKS_REMAINING = """
+SELECT vector_dims(e.embedding) AS dimensions,
+       EXISTS (SELECT 1 FROM documents d WHERE CAST(d.id AS text) = e.cmetadata->>'document_id') AS has_document,
+       count(*) AS chunks
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+WHERE c.name = :collection_name
+GROUP BY 1, 2
+"""
+
+
+async def _migrate_legacy_chunks(conn: AsyncConnection) -> int:
+    """Move the legacy chunks, returns the number moved."""
+
+    if not await conn.scalar(text("SELECT to_regclass('langchain_pg_embedding') IS NOT NULL")):
+        return 0
+    collection = {"collection_name": settings.pgvector_collection_name}
+    params = collection | {"dimensions": settings.embeddings_dimensions}
+    moved = await conn.execute(text(LEGACY_CHUNKS_MIGRATION), params)
+    removed = await conn.execute(text(LEGACY_CHUNKS_CLEANUP), collection)
+    if removed.rowcount:
+        logger.info(f"Moved {removed.rowcount} chunks from langchain_pg_embedding to document_chunks.")
+
+    for dimensions, has_document, chunks in await conn.execute(text(LEGACY_CHUNKS_REMAINING), collection):
+        if dimensions != settings.embeddings_dimensions:
+            reason = f"they have {dimensions} dimensions, EMBEDDINGS_DIMENSIONS is {settings.embeddings_dimensions}"
+        elif not has_document:
+            reason = "their document no longer exists"
+        else:
+            reason = "they conflict with existing chunks"
+        logger.warning(f"Kept {chunks} chunks in langchain_pg_embedding, not migrated because {reason}.")
+    return moved.rowcount
+
+
+# `threads.chunk_count` is maintained by the chunk writes and deletes, chunks written before it are counted once.
+CHUNK_COUNT_BACKFILL = """
+UPDATE threads t SET chunk_count = c.chunk_count
+FROM (SELECT thread_id, count(*) AS chunk_count FROM document_chunks GROUP BY thread_id) c
+WHERE c.thread_id = t.id
+"""
+
+
+async def _has_column(conn: AsyncConnection, table: str, column: str) -> bool:
+    return bool(
+        await conn.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column)"
+            ),
+            {"table": table, "column": column},
+        )
+    )
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    backfill_chunk_counts = not await _has_column(conn, "threads", "chunk_count")
+    for statement in SCHEMA_MIGRATIONS:
+        await conn.execute(text(statement))
+    if await _migrate_legacy_chunks(conn) or backfill_chunk_counts:
+        counted = await conn.execute(text(CHUNK_COUNT_BACKFILL))
+        logger.info(f"Counted the chunks of {counted.rowcount} existing threads.")
+    logger.info("✅ Database migrations applied successfully")
@@ -1,10 +1,16 @@
 from datetime import datetime
+from enum import StrEnum
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey, String, func
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import BigInteger, Computed, ForeignKey, Index, LargeBinary, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+from app.config import settings
+from app.db.partitioning import chunk_partition_by
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
@@ -34,6 +40,10 @@ class Thread(Base):
     title: Mapped[str] = mapped_column(String(100), default="New Chat")
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    # Bumped whenever the chunks of the thread change, invalidates its cached retrievals.
+    corpus_version: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Number of chunks of the thread, kept up to date with `corpus_version`.
+    chunk_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     def __repr__(self):
         return f"<Thread {self.title}>"
@@ -45,6 +55,109 @@ class Document(Base):
     file_name: Mapped[str] = mapped_column(String(255))
     uploaded_at: Mapped[datetime] = mapped_column(server_default=func.now())
     thread_id: Mapped[UUID] = mapped_column(ForeignKey("threads.id", ondelete="CASCADE"))
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # `chunking_signature()` of the settings the chunks were produced with, NULL until the document is indexed.
+    index_signature: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
     def __repr__(self):
         return f"<Document {self.file_name}>"
+
+
+# Text search configuration of `document_chunks.content_tsv`, queries must use the same one.
+TEXT_SEARCH_CONFIG = "english"
+# `chunk_metadata` flag of migrated chunks whose position in their document could not be recovered, their
+# `chunk_index` is arbitrary so they are neither expanded with nor merged into their neighbours.
+CHUNK_ORDER_UNKNOWN = "chunk_order_unknown"
+
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    # Keys and unique indexes include `thread_id`, the partition key when `chunk_partitioning` is enabled.
+    __table_args__ = (
+        Index(
+            "ix_document_chunks_thread_id_document_id_chunk_index",
+            "thread_id",
+            "document_id",
+            "chunk_index",
+            unique=True,
+        ),
+        Index("ix_document_chunks_user_id_thread_id", "user_id", "thread_id"),
+        Index("ix_document_chunks_document_id", "document_id"),
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        {"postgresql_partition_by": chunk_partition_by()},
+    )
+    id: Mapped[UUID] = mapped_column(primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    thread_id: Mapped[UUID] = mapped_column(ForeignKey("threads.id", ondelete="CASCADE"), primary_key=True)
+    document_id: Mapped[UUID] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"))
+    chunk_index: Mapped[int]
+    # Character offsets of the chunk in its page (or file), unknown for chunks indexed before they were recorded.
+    char_start: Mapped[int | None] = mapped_column(nullable=True)
+    char_end: Mapped[int | None] = mapped_column(nullable=True)
+    content: Mapped[str] = mapped_column(Text)
+    chunk_metadata: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Deferred, so loading chunks for retrieval does not transfer their vectors.
+    embedding: Mapped[list[float]] = mapped_column(Vector(settings.embeddings_dimensions), deferred=True)
+    # Maintained by Postgres from `content`, for the lexical half of hybrid search.
+    content_tsv: Mapped[str] = mapped_column(
+        TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', content)", persisted=True), deferred=True
+    )
+
+    def __repr__(self):
+        return f"<DocumentChunk {self.document_id}:{self.chunk_index}>"
+
+
+class IngestionJobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    document_id: Mapped[UUID | None] = mapped_column(
+        ForeignKey("documents.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    thread_id: Mapped[UUID] = mapped_column(ForeignKey("threads.id", ondelete="CASCADE"))
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    file_name: Mapped[str] = mapped_column(String(255))
+    file_path: Mapped[str] = mapped_column(String(1024))
+    status: Mapped[str] = mapped_column(String(16), default=IngestionJobStatus.PENDING, index=True)
+    attempts: Mapped[int] = mapped_column(default=0)
+    pages_total: Mapped[int | None] = mapped_column(nullable=True)
+    pages_parsed: Mapped[int] = mapped_column(default=0)
+    chunks_total: Mapped[int | None] = mapped_column(nullable=True)
+    chunks_embedded: Mapped[int] = mapped_column(default=0)
+    chunks_cached: Mapped[int] = mapped_column(default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<IngestionJob {self.file_name} ({self.status})>"
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    model_name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    embedding: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry {self.model_name}:{self.content_hash[:12]}>"
+
+
+class CheckpointPruneStats(Base):
+    """Rows and bytes deleted from a checkpoint table by `app.db.checkpoint_retention`, across all workers."""
+
+    __tablename__ = "checkpoint_prune_stats"
+    table_name: Mapped[str] = mapped_column(String(63), primary_key=True)
+    rows_pruned: Mapped[int] = mapped_column(BigInteger, default=0)
+    bytes_pruned: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<CheckpointPruneStats {self.table_name}: {self.rows_pruned} rows>"
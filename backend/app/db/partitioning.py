@@ -0,0 +1,215 @@
+"""
+Optional partitioning of `document_chunks` by `thread_id`, chosen with `chunk_partitioning`:
+
+- `none`: a single table.
+- `hash`: `chunk_hash_partitions` hash partitions, so a thread's search only touches the partition holding it.
+- `thread`: one list partition per thread (plus a default partition), created before the thread's first chunk is
+  written; deleting a thread drops its partition instead of deleting its rows.
+
+Retrieval always filters on `thread_id`, which Postgres uses to prune the other partitions. When the setting changes,
+the table is rebuilt with the new layout at startup, keeping its rows.
+
+Thread partitions are created and dropped while other threads are searched. A new partition is created on its own
+and then attached, which only takes a `SHARE UPDATE EXCLUSIVE` lock on `document_chunks`, so searches keep running.
+Dropping one needs an `ACCESS EXCLUSIVE` lock on `document_chunks` (`DETACH ... CONCURRENTLY` is not allowed next to
+the default partition). The drop therefore waits at most `PARTITION_DROP_LOCK_TIMEOUT` for the lock, so searches
+never queue behind it for long. If it times out, the thread's rows are deleted by the foreign key cascade and the
+garbage collector drops the empty partition later.
+"""
+
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+
+CHUNK_TABLE = "document_chunks"
+CHUNK_COLUMNS = (
+    "id, user_id, thread_id, document_id, chunk_index, char_start, char_end, content, chunk_metadata, embedding"
+)
+REBUILD_TABLE = "document_chunks_rebuild"
+# Longest wait for the `ACCESS EXCLUSIVE` lock of a partition drop, concurrent searches queue behind it meanwhile.
+PARTITION_DROP_LOCK_TIMEOUT = "1s"
+
+
+def chunk_partition_by() -> str | None:
+    """The `PARTITION BY` clause of `document_chunks` for the current settings."""
+
+    if settings.chunk_partitioning == "hash":
+        return "HASH (thread_id)"
+    if settings.chunk_partitioning == "thread":
+        return "LIST (thread_id)"
+    return None
+
+
+def thread_partition_name(thread_id: UUID) -> str:
+    return f"{CHUNK_TABLE}_{thread_id.hex}"
+
+
+async def _current_layout(conn: AsyncConnection) -> tuple[str, int] | None:
+    """The partitioning (`none`, `hash` or `thread`) and partition count of the existing table, if any."""
+
+    if not await conn.scalar(text(f"SELECT to_regclass('{CHUNK_TABLE}') IS NOT NULL")):
+        return None
+    row = (
+        await conn.execute(
+            text(
+                f"""
+                SELECT p.partstrat AS strategy,
+                       (SELECT count(*) FROM pg_inherits i WHERE i.inhparent = p.partrelid) AS partitions
+                FROM pg_partitioned_table p
+                WHERE p.partrelid = '{CHUNK_TABLE}'::regclass
+                """
+            )
+        )
+    ).first()
+    if row is None:
+        return "none", 0
+    return ("hash" if row.strategy == "h" else "thread"), row.partitions
+
+
+async def set_aside_mismatched_chunk_table(conn: AsyncConnection) -> None:
+    """
+    Move the rows of a `document_chunks` table whose layout differs from the settings into a temporary table and drop
+    it, so `create_all` recreates it; `ensure_chunk_partitions` then copies the rows back. Runs in `init_db`'s
+    transaction, so a failed rebuild leaves the table untouched.
+    """
+
+    layout = await _current_layout(conn)
+    if layout is None:
+        return
+    strategy, partitions = layout
+    if strategy == settings.chunk_partitioning and (strategy != "hash" or partitions == settings.chunk_hash_partitions):
+        return
+
+    logger.info(f"Rebuilding {CHUNK_TABLE} with '{settings.chunk_partitioning}' partitioning (was '{strategy}')...")
+    await conn.execute(text(f"CREATE TEMPORARY TABLE {REBUILD_TABLE} ON COMMIT DROP AS SELECT * FROM {CHUNK_TABLE}"))
+    await conn.execute(text(f"DROP TABLE {CHUNK_TABLE} CASCADE"))
+
+
+async def _create_thread_partition(conn: AsyncConnection, thread_id: UUID) -> None:
+    # `CREATE TABLE ... PARTITION OF` would lock the whole table, `ATTACH PARTITION` does not block its readers.
+    # Attaching copies the indexes and foreign keys of the parent to the (empty) partition.
+    partition = thread_partition_name(thread_id)
+    await conn.execute(text(f"CREATE TABLE {partition} (LIKE {CHUNK_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    await conn.execute(text(f"ALTER TABLE {CHUNK_TABLE} ATTACH PARTITION {partition} FOR VALUES IN ('{thread_id}')"))
+
+
+async def ensure_chunk_partitions(conn: AsyncConnection) -> None:
+    """Create the fixed partitions and copy back the rows set aside by `set_aside_mismatched_chunk_table`."""
+
+    if settings.chunk_partitioning == "hash":
+        for remainder in range(settings.chunk_hash_partitions):
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {CHUNK_TABLE}_p{remainder} PARTITION OF {CHUNK_TABLE} "
+                    f"FOR VALUES WITH (MODULUS {settings.chunk_hash_partitions}, REMAINDER {remainder})"
+                )
+            )
+    elif settings.chunk_partitioning == "thread":
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {CHUNK_TABLE}_default PARTITION OF {CHUNK_TABLE} DEFAULT"))
+
+    if not await conn.scalar(text(f"SELECT to_regclass('pg_temp.{REBUILD_TABLE}') IS NOT NULL")):
+        return
+    if settings.chunk_partitioning == "thread":
+        thread_ids = (await conn.execute(text(f"SELECT DISTINCT thread_id FROM {REBUILD_TABLE}"))).scalars().all()
+        for thread_id in thread_ids:
+            await _create_thread_partition(conn, thread_id)
+    result = await conn.execute(
+        text(f"INSERT INTO {CHUNK_TABLE} ({CHUNK_COLUMNS}) SELECT {CHUNK_COLUMNS} FROM {REBUILD_TABLE}")
+    )
+    logger.info(f"✅ Rebuilt {CHUNK_TABLE}, {result.rowcount} chunks copied")
+
+
+async def ensure_thread_partition(conn: AsyncConnection, thread_id: UUID) -> None:
+    """
+    Create the partition of a thread (with `thread` partitioning) before chunks are written for it.
+    Chunks that landed in the default partition in the meantime are moved to the new partition.
+    """
+
+    if settings.chunk_partitioning != "thread":
+        return
+    if await conn.scalar(text(f"SELECT to_regclass('{thread_partition_name(thread_id)}') IS NOT NULL")):
+        return
+
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:thread_id))"), {"thread_id": str(thread_id)})
+    if await conn.scalar(text(f"SELECT to_regclass('{thread_partition_name(thread_id)}') IS NOT NULL")):
+        return
+    # A new partition cannot be attached while the default partition holds rows that belong to it.
+    moved_table = f"{CHUNK_TABLE}_moved"
+    await conn.execute(text(f"CREATE TEMPORARY TABLE {moved_table} (LIKE {CHUNK_TABLE}) ON COMMIT DROP"))
+    await conn.execute(
+        text(
+            f"""
+            WITH moved AS (DELETE FROM {CHUNK_TABLE}_default WHERE thread_id = :thread_id RETURNING *)
+            INSERT INTO {moved_table} ({CHUNK_COLUMNS}) SELECT {CHUNK_COLUMNS} FROM moved
+            """
+        ),
+        {"thread_id": thread_id},
+    )
+    await _create_thread_partition(conn, thread_id)
+    await conn.execute(text(f"INSERT INTO {CHUNK_TABLE} ({CHUNK_COLUMNS}) SELECT {CHUNK_COLUMNS} FROM {moved_table}"))
+    logger.info(f"Created chunk partition {thread_partition_name(thread_id)} for thread {thread_id}.")
+
+
+async def orphan_thread_partitions(conn: AsyncConnection) -> list[str]:
+    """Partitions of threads that no longer exist, e.g. removed by the cascade of a user deletion."""
+
+    if settings.chunk_partitioning != "thread":
+        return []
+    result = await conn.execute(
+        text(
+            f"""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = '{CHUNK_TABLE}'::regclass
+              AND c.relname <> '{CHUNK_TABLE}_default'
+              AND NOT EXISTS (
+                  SELECT 1 FROM threads t WHERE replace(CAST(t.id AS text), '-', '') = substr(c.relname, :prefix)
+              )
+            """
+        ),
+        {"prefix": len(CHUNK_TABLE) + 2},
+    )
+    return list(result.scalars())
+
+
+async def drop_partition(conn: AsyncConnection, partition: str) -> bool:
+    """
+    Drop a chunk partition, unless its lock is not granted within `PARTITION_DROP_LOCK_TIMEOUT`.
+    Runs in a savepoint, so a timeout leaves the surrounding transaction usable. Returns whether it was dropped.
+    """
+
+    previous_timeout = await conn.scalar(text("SELECT current_setting('lock_timeout')"))
+    try:
+        async with conn.begin_nested():
+            await conn.execute(
+                text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": PARTITION_DROP_LOCK_TIMEOUT}
+            )
+            await conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+    except DBAPIError as e:
+        logger.warning(f"Could not lock {CHUNK_TABLE} to drop {partition}, leaving it for garbage collection: {e}")
+        return False
+    finally:
+        await conn.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": previous_timeout})
+    return True
+
+
+async def drop_thread_partition(conn: AsyncConnection, thread_id: UUID) -> bool:
+    """
+    Drop the partition of a thread, the fast path for deleting all its chunks. Returns whether it was dropped, when
+    not the chunks are deleted with their thread as usual.
+    """
+
+    if settings.chunk_partitioning != "thread":
+        return False
+    if not await conn.scalar(text(f"SELECT to_regclass('{thread_partition_name(thread_id)}') IS NOT NULL")):
+        return False
+    if not await drop_partition(conn, thread_partition_name(thread_id)):
+        return False
+    logger.info(f"Dropped chunk partition {thread_partition_name(thread_id)} of thread {thread_id}.")
+    return True
@@ -1,106 +1,589 @@
+import asyncio
+import hashlib
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from pathlib import Path
-from uuid import UUID, uuid4
+from uuid import UUID
 
 from langchain.embeddings import init_embeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
-from langchain_community.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
-from langchain_postgres import PGVector
 from loguru import logger
+from sqlalchemy import and_, delete, func, literal, or_, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import undefer
 
 from app.config import settings
+from app.db.document_parsing import iter_split_windows
+from app.db.embedding_cache import embed_queries_with_cache, embed_query_with_cache, embed_with_cache
+from app.db.hybrid_search import hybrid_chunks_statement
+from app.db.main import async_session, engine
+from app.db.models import CHUNK_ORDER_UNKNOWN, DocumentChunk
+from app.db.partitioning import ensure_thread_partition
+from app.db.retrieval_cache import (
+    bump_corpus_version,
+    bump_document_corpus_version,
+    get_cached_retrieval,
+    get_corpus_stats,
+    put_cached_retrieval,
+    retrieval_key,
+)
+from app.db.thread_vector_cache import thread_vector_cache
+from app.db.vector_index import nearest_chunks_statement, set_search_parameters
+
+# Providers whose clients retry on their own by default; `_embed_with_retry` does the retrying instead.
+CLIENT_RETRY_PROVIDERS = {"openai", "azure_openai", "mistralai", "cohere"}
 
 embeddings = init_embeddings(
     model=settings.embeddings_model_name,
     base_url=settings.embeddings_base_url,
     provider=settings.model_provider,
     api_key=settings.api_key,
+    **({"max_retries": 0} if settings.model_provider in CLIENT_RETRY_PROVIDERS else {}),
 )
 
+# Metadata keys stored in their own `document_chunks` columns rather than in `chunk_metadata`.
+CHUNK_COLUMN_KEYS = {"id", "chunk_index", "start_index", "document_id", "thread_id", "user_id"}
+# asyncpg sends at most 32767 bind parameters per statement, one per column of every inserted row.
+MAX_QUERY_PARAMETERS = 32767
 
-vector_store = PGVector(
-    embeddings=embeddings,  # type: ignore
-    connection=settings.pgvector_connection,
-    collection_name=settings.pgvector_collection_name,
-    use_jsonb=True,
-    async_mode=True,
-)
 
+@dataclass
+class IndexingProgress:
+    """`chunks_total` counts the chunks of the pages parsed so far, it is final once all pages are parsed."""
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-    length_function=len,
-)
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_cached: int = 0
+    pages_total: int | None = None
+    pages_parsed: int = 0
 
 
-DOCUMENT_LOADER_MAPPING: dict[str, type[BaseLoader]] = {
-    ".pdf": PyPDFLoader,
-    ".docx": Docx2txtLoader,
-    ".txt": TextLoader,
-}
+ProgressCallback = Callable[[IndexingProgress], Awaitable[None]]
 
-allowd_extensions = list(DOCUMENT_LOADER_MAPPING.keys())
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
 
 
-async def _load_and_split_documents(file_path: Path) -> list[Document]:
+def chunk_id(document_id: UUID, chunk_index: int) -> str:
     """
-    Load and split documents based on file extension.
-    Raises:
-        UnsupportedFileTypeError: If the file extension is not supported.
-        Exception: For other loading or splitting errors.
+    Deterministic chunk ID, so a retried ingestion can tell which chunks were already written.
+    Equivalent to `md5(document_id || ':' || chunk_index)::uuid` in SQL, see `clone_document_chunks`.
     """
+    return str(UUID(hashlib.md5(f"{document_id}:{chunk_index}".encode()).hexdigest()))
+
+
+def chunking_signature() -> str:
+    """Identifies the settings chunks were produced with; documents indexed with the same signature can be reused."""
+    return f"{settings.embeddings_model_name}:{settings.chunk_size}:{settings.chunk_overlap}"
+
+
+def _is_retryable(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Honour the provider's `Retry-After` header, otherwise exponential backoff with full jitter."""
+
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after", ""))
+    except ValueError:
+        delay = settings.embedding_retry_base_delay_seconds * 2**attempt
+        return random.uniform(0, min(delay, settings.embedding_retry_max_delay_seconds))
+    return min(retry_after, settings.embedding_retry_max_delay_seconds)
+
+
+async def _embed_with_retry(texts: list[str]) -> list[list[float]]:
+    """Embed a batch of texts, retrying rate limits and transient provider errors with exponential backoff."""
+
+    attempt = 0
+    while True:
+        try:
+            return await embeddings.aembed_documents(texts)
+        except Exception as e:
+            if attempt >= settings.embedding_max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            logger.warning(
+                f"Embedding batch of {len(texts)} chunks failed ({type(e).__name__}: {e}), "
+                f"retry {attempt}/{settings.embedding_max_retries} in {delay:.1f}s."
+            )
+            await asyncio.sleep(delay)
+
+
+def _chunk_row(split: Document, embedding: list[float]) -> dict:
+    metadata = split.metadata
+    return {
+        "id": UUID(metadata["id"]),
+        "user_id": UUID(metadata["user_id"]),
+        "thread_id": UUID(metadata["thread_id"]),
+        "document_id": UUID(metadata["document_id"]),
+        "chunk_index": metadata["chunk_index"],
+        "char_start": metadata.get("start_index"),
+        "char_end": metadata["start_index"] + len(split.page_content) if "start_index" in metadata else None,
+        "content": split.page_content,
+        "chunk_metadata": {key: value for key, value in metadata.items() if key not in CHUNK_COLUMN_KEYS},
+        "embedding": embedding,
+    }
+
+
+def _chunk_document(chunk: DocumentChunk) -> Document:
+    return Document(
+        id=str(chunk.id),
+        page_content=chunk.content,
+        metadata={
+            **chunk.chunk_metadata,
+            "id": str(chunk.id),
+            "chunk_index": chunk.chunk_index,
+            "char_start": chunk.char_start,
+            "char_end": chunk.char_end,
+            "document_id": str(chunk.document_id),
+            "thread_id": str(chunk.thread_id),
+            "user_id": str(chunk.user_id),
+        },
+    )
+
 
-    file_extension = file_path.suffix.lower()
-    if file_extension not in DOCUMENT_LOADER_MAPPING:
-        raise ValueError(f"Unsupported file type: {file_extension}, Allowed types: {', '.join(allowd_extensions)}")
-    loader = DOCUMENT_LOADER_MAPPING[file_extension](file_path)  # type: ignore
-    documents = await loader.aload()
-    splits = text_splitter.split_documents(documents)
-    logger.info(f"Successfully loaded and split {file_path} into {len(splits)} chunks.")
+async def _get_existing_chunk_ids(ids: list[str]) -> set[str]:
+    statement = select(DocumentChunk.id).where(DocumentChunk.id.in_([UUID(id_) for id_ in ids]))
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return {str(id_) for id_ in result.scalars()}
 
-    return splits
 
+async def _write_chunks(rows: list[dict]) -> None:
+    """Insert chunks of a single thread, in one transaction but as many statements as the parameter limit needs."""
 
-async def index_document_to_pgvector(file_path: Path, document_id: UUID, thread_id: UUID, user_id: UUID) -> list[str]:
-    """Index a document to PGVector."""
+    rows_per_statement = MAX_QUERY_PARAMETERS // len(rows[0])
+    inserted = 0
+    async with async_session() as session:
+        for start in range(0, len(rows), rows_per_statement):
+            statement = insert(DocumentChunk).values(rows[start : start + rows_per_statement])
+            result = await session.execute(statement.on_conflict_do_nothing())
+            inserted += result.rowcount
+        await bump_corpus_version(session, rows[0]["thread_id"], inserted)
+        await session.commit()
+
+
+async def index_document_to_pgvector(
+    file_path: Path,
+    document_id: UUID,
+    thread_id: UUID,
+    user_id: UUID,
+    file_name: str | None = None,
+    on_progress: ProgressCallback | None = None,
+    resume: bool = False,
+) -> IndexingProgress:
+    """
+    Index a document to PGVector.
+
+    The document is streamed through the pipeline a page window at a time: each window is split, embedded and
+    written in batches of `embedding_batch_size` while the next windows are parsed. At most
+    `embedding_max_concurrency` batches are in flight and parsing waits for a free slot, so peak memory depends on
+    the window and batch sizes rather than on the document size.
+
+    Every written batch is durable: with `resume=True`, chunks that a previous attempt already wrote are skipped
+    instead of being embedded again. Vectors are looked up in the embedding cache first, only cache misses are sent
+    to the provider.
+
+    `file_name` is stored in the chunk metadata (defaults to the name of `file_path`), and `on_progress`
+    is awaited with the `IndexingProgress` as indexing advances.
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
 
     logger.info(f"Starting indexing for document: {file_path} with document_id: {document_id}")
-    splits = await _load_and_split_documents(file_path)
-    for split in splits:
-        split.metadata["id"] = str(uuid4())
-        split.metadata["file_name"] = file_path.name
-        split.metadata["document_id"] = str(document_id)
-        split.metadata["thread_id"] = str(thread_id)
-        split.metadata["user_id"] = str(user_id)
+    async with engine.begin() as conn:
+        await ensure_thread_partition(conn, thread_id)
+    progress = IndexingProgress()
+    semaphore = asyncio.Semaphore(settings.embedding_max_concurrency)
+    progress_lock = asyncio.Lock()
+    tasks: set[asyncio.Task] = set()
+    errors: list[Exception] = []
+
+    async def report_progress() -> None:
+        if on_progress is not None:
+            async with progress_lock:
+                await on_progress(progress)
+
+    async def index_batch(batch: list[Document]) -> None:
+        try:
+            cached = 0
+            if resume:
+                existing_ids = await _get_existing_chunk_ids([doc.metadata["id"] for doc in batch])
+                pending = [doc for doc in batch if doc.metadata["id"] not in existing_ids]
+            else:
+                pending = batch
+            if pending:
+                texts = [doc.page_content for doc in pending]
+                vectors, cached = await embed_with_cache(settings.embeddings_model_name, texts, _embed_with_retry)
+                await _write_chunks([_chunk_row(doc, vector) for doc, vector in zip(pending, vectors)])
+            progress.chunks_embedded += len(batch)
+            progress.chunks_cached += cached
+            await report_progress()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    async def submit_batch(batch: list[Document]) -> None:
+        # Waiting for a free slot here is what stops parsing from running ahead of embedding.
+        await semaphore.acquire()
+        if errors:
+            semaphore.release()
+            raise errors[0]
+        task = asyncio.create_task(index_batch(batch))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
 
+    batch_size = settings.embedding_batch_size
+    pending_splits: list[Document] = []
+    windows = iter_split_windows(file_path)
     try:
-        doc_ids = await vector_store.aadd_documents(splits, ids=[split.metadata["id"] for split in splits])
-        logger.info(
-            f"Successfully indexed {len(splits)} chunks for document {file_path} (document_id: {document_id}) to PGVector."
-        )
-        return doc_ids
+        async for window in windows:
+            for split in window.splits:
+                split.metadata["id"] = chunk_id(document_id, progress.chunks_total)
+                split.metadata["chunk_index"] = progress.chunks_total
+                split.metadata["file_name"] = file_name or file_path.name
+                split.metadata["document_id"] = str(document_id)
+                split.metadata["thread_id"] = str(thread_id)
+                split.metadata["user_id"] = str(user_id)
+                progress.chunks_total += 1
+            progress.pages_total = window.pages_total
+            progress.pages_parsed += window.pages
+            await report_progress()
+
+            pending_splits.extend(window.splits)
+            while len(pending_splits) >= batch_size:
+                await submit_batch(pending_splits[:batch_size])
+                pending_splits = pending_splits[batch_size:]
+        if pending_splits:
+            await submit_batch(pending_splits)
+        await asyncio.gather(*tasks)
+        if errors:
+            raise errors[0]
     except Exception as e:
-        logger.error(f"Error adding documents to PGVector: {e}")
+        for task in tasks:
+            task.cancel()
+        logger.error(
+            f"Error adding documents to PGVector after {progress.chunks_embedded}/{progress.chunks_total} chunks "
+            f"(document_id: {document_id}): {e}"
+        )
         raise
+    finally:
+        await windows.aclose()
+
+    logger.info(
+        f"Successfully indexed {progress.chunks_total} chunks from {progress.pages_parsed} pages "
+        f"({progress.chunks_cached} from the embedding cache) for document {file_path} "
+        f"(document_id: {document_id}) to PGVector."
+    )
+    return progress
+
+
+async def clone_document_chunks(
+    source_document_id: UUID, document_id: UUID, thread_id: UUID, user_id: UUID, file_name: str
+) -> int:
+    """
+    Copy the chunks (vectors included) of an already indexed document to a new document with a single
+    `INSERT ... SELECT`, rewriting the ID, document, thread, user and file name. Returns the chunk count.
+    The `source` path of the original upload is dropped, the new upload is not kept once its chunks are cloned.
+    """
+
+    statement = text(
+        """
+        INSERT INTO document_chunks
+            (id, user_id, thread_id, document_id, chunk_index, char_start, char_end, content, chunk_metadata,
+             embedding)
+        SELECT CAST(md5(CAST(:document_id AS text) || ':' || s.chunk_index) AS uuid),
+               CAST(:user_id AS uuid), CAST(:thread_id AS uuid), CAST(:document_id AS uuid),
+               s.chunk_index, s.char_start, s.char_end, s.content,
+               (s.chunk_metadata - 'source') || jsonb_build_object('file_name', CAST(:file_name AS text)),
+               s.embedding
+        FROM document_chunks s
+        WHERE s.document_id = CAST(:source_document_id AS uuid)
+        """
+    )
+    async with engine.begin() as conn:
+        await ensure_thread_partition(conn, thread_id)
+        result = await conn.execute(
+            statement,
+            {
+                "document_id": str(document_id),
+                "thread_id": str(thread_id),
+                "user_id": str(user_id),
+                "file_name": file_name,
+                "source_document_id": str(source_document_id),
+            },
+        )
+        await bump_corpus_version(conn, thread_id, result.rowcount)
+    logger.info(f"Cloned {result.rowcount} chunks of document {source_document_id} to document {document_id}.")
+    return result.rowcount
 
 
-async def search_documents_in_pgvector(query: str = "", k: int = 1, filter: dict | None = None) -> list[Document]:
-    """Search documents in PGVector based on query, k and filter."""
+# Threads whose chunks are being loaded into `thread_vector_cache`.
+_thread_matrix_loads: dict[UUID, asyncio.Task] = {}
 
-    logger.info(f"Search documents with query: {query}, k: {k}, filter: {filter} in PGVector.")
-    documents = await vector_store.asimilarity_search(query, k=k, filter=filter)
-    if not documents:
-        logger.info(f"No documents found for query: {query} and filter: {filter} in PGVector.")
+
+async def _load_thread_matrix(thread_id: UUID, corpus_version: int) -> None:
+    """Load the chunks and embeddings of a small thread into `thread_vector_cache`."""
+
+    async with async_session() as session:
+        chunk_count = await session.scalar(
+            select(func.count()).select_from(DocumentChunk).where(DocumentChunk.thread_id == thread_id)
+        )
+        if not chunk_count or chunk_count > settings.thread_vector_cache_max_chunks:
+            return
+        result = await session.execute(
+            select(DocumentChunk)
+            .options(undefer(DocumentChunk.embedding))
+            .where(DocumentChunk.thread_id == thread_id)
+            .order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+        )
+        chunks = result.scalars().all()
+    thread_vector_cache.put(
+        thread_id, corpus_version, [_chunk_document(chunk) for chunk in chunks], [chunk.embedding for chunk in chunks]
+    )
+    logger.info(f"Loaded {len(chunks)} chunks of thread {thread_id} into the in-memory vector cache.")
+
+
+def _schedule_thread_matrix_load(thread_id: UUID, corpus_version: int) -> None:
+    if thread_id in _thread_matrix_loads:
+        return
+
+    async def load() -> None:
+        try:
+            await _load_thread_matrix(thread_id, corpus_version)
+        except Exception as e:
+            logger.warning(f"Failed to load thread {thread_id} into the in-memory vector cache: {e}")
+        finally:
+            _thread_matrix_loads.pop(thread_id, None)
+
+    _thread_matrix_loads[thread_id] = asyncio.create_task(load())
+
+
+async def _search_chunks(
+    queries: list[str],
+    query_embeddings: list[list[float]],
+    thread_id: UUID,
+    k: int,
+    ef_search: int | None,
+    probes: int | None,
+) -> list[list[DocumentChunk]]:
+    """
+    Run the searches of several queries as the branches of a single `UNION ALL` statement, each with its own CTEs.
+    Returns the chunks of each query, best first.
+    """
+
+    branches = []
+    for query_index, (query, query_embedding) in enumerate(zip(queries, query_embeddings)):
+        name = f"q{query_index}_"
+        if settings.hybrid_search:
+            statement = hybrid_chunks_statement(query, query_embedding, k, thread_id, name=name)
+            score = statement.selected_columns["score"]
+        else:
+            statement = nearest_chunks_statement(query_embedding, k, thread_id=thread_id, name=name)
+            score = statement.selected_columns["distance"]
+        branches.append(
+            statement.with_only_columns(
+                DocumentChunk.id,
+                DocumentChunk.thread_id,
+                score.label("score"),
+                literal(query_index).label("query_index"),
+            )
+        )
+    hits = union_all(*branches).subquery("hits")
+    statement = select(DocumentChunk, hits.c.score, hits.c.query_index).join(
+        hits, and_(DocumentChunk.id == hits.c.id, DocumentChunk.thread_id == hits.c.thread_id)
+    )
+    async with async_session() as session:
+        await set_search_parameters(session, ef_search=ef_search, probes=probes)
+        rows = (await session.execute(statement)).all()
+
+    # RRF scores are best when highest, distances when lowest; iterative index scans may also return neighbours
+    # slightly out of order.
+    rows = sorted(rows, key=lambda row: -row.score if settings.hybrid_search else row.score)
+    results: list[list[DocumentChunk]] = [[] for _ in queries]
+    for row in rows:
+        results[row.query_index].append(row.DocumentChunk)
+    return results
+
+
+def _merge_spans(spans: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for start, stop in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+async def _expand_windows(results: list[list[Document]], thread_id: UUID, window: int) -> list[list[Document]]:
+    """
+    Add the `window` chunks before and after each hit (same document, by `chunk_index`), fetched for all queries
+    with a single range query. Each hit is followed by its neighbours, which the context assembler merges back
+    into one passage. Chunks of unknown order have no meaningful neighbours and are neither expanded nor added.
+    """
+
+    spans: dict[str, list[tuple[int, int]]] = {}
+    for documents in results:
+        for document in documents:
+            if document.metadata.get(CHUNK_ORDER_UNKNOWN):
+                continue
+            chunk_index = document.metadata["chunk_index"]
+            spans.setdefault(document.metadata["document_id"], []).append((chunk_index - window, chunk_index + window))
+    if not spans:
+        return results
+
+    ranges = [
+        and_(DocumentChunk.document_id == UUID(document_id), DocumentChunk.chunk_index.between(start, stop))
+        for document_id, document_spans in spans.items()
+        for start, stop in _merge_spans(document_spans)
+    ]
+    async with async_session() as session:
+        result = await session.execute(select(DocumentChunk).where(DocumentChunk.thread_id == thread_id, or_(*ranges)))
+        chunks = {(str(chunk.document_id), chunk.chunk_index): chunk for chunk in result.scalars()}
+
+    expanded = []
+    for documents in results:
+        positions = {(document.metadata["document_id"], document.metadata["chunk_index"]) for document in documents}
+        query_documents = []
+        for document in documents:
+            query_documents.append(document)
+            if document.metadata.get(CHUNK_ORDER_UNKNOWN):
+                continue
+            document_id, chunk_index = document.metadata["document_id"], document.metadata["chunk_index"]
+            for neighbour_index in range(chunk_index - window, chunk_index + window + 1):
+                neighbour = chunks.get((document_id, neighbour_index))
+                if neighbour is None or neighbour.chunk_metadata.get(CHUNK_ORDER_UNKNOWN):
+                    continue
+                if (document_id, neighbour_index) not in positions:
+                    positions.add((document_id, neighbour_index))
+                    query_documents.append(_chunk_document(neighbour))
+        expanded.append(query_documents)
+    return expanded
+
+
+async def search_documents_in_pgvector_batch(
+    queries: list[str],
+    thread_id: UUID,
+    k: int = 3,
+    window: int | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[list[Document]]:
+    """
+    Search the chunks of a thread for several queries at once, see `search_documents_in_pgvector`.
+    Uncached queries are embedded in a single call and searched in a single SQL statement.
+    Returns the documents of each query, in the order of `queries`.
+    """
+
+    window = settings.retrieval_window_chunks if window is None else window
+    logger.info(f"Search documents with queries: {queries}, k: {k}, thread_id: {thread_id} in PGVector.")
+    results: list[list[Document] | None] = [None] * len(queries)
+    corpus_stats = await get_corpus_stats(thread_id)
+    if corpus_stats is not None and corpus_stats.chunk_count == 0:
+        logger.info(f"Thread {thread_id} has no document chunks, skipping the search.")
+        return [[] for _ in queries]
+    corpus_version = corpus_stats.corpus_version if corpus_stats is not None else None
+    cache_keys = []
+    if corpus_version is not None:
+        cache_keys = [
+            retrieval_key(thread_id, corpus_version, query, k, window, ef_search, probes) for query in queries
+        ]
+        results = [get_cached_retrieval(cache_key) for cache_key in cache_keys]
+    pending = [index for index, documents in enumerate(results) if documents is None]
+    if len(pending) < len(queries):
+        logger.info(f"Found cached document chunks for {len(queries) - len(pending)} queries, thread_id: {thread_id}.")
+    if not pending:
+        return results  # type: ignore[return-value]
+
+    if len(pending) == 1:
+        query_embeddings = [
+            await embed_query_with_cache(settings.embeddings_model_name, queries[pending[0]], embeddings.aembed_query)
+        ]
     else:
-        logger.info(f"Found {len(documents)} document chunks for query: {query} and filter: {filter} in PGVector.")
-    return documents
+        # Query and document embeddings are the same for the OpenAI compatible providers, one call embeds them all.
+        query_embeddings = await embed_queries_with_cache(
+            settings.embeddings_model_name, [queries[index] for index in pending], embeddings.aembed_documents
+        )
+    embeddings_by_index = dict(zip(pending, query_embeddings))
+
+    # The lexical half of hybrid search needs Postgres, the in-memory matrix only replaces the pure vector search.
+    if settings.thread_vector_cache and not settings.hybrid_search and corpus_version is not None:
+        for index in pending:
+            results[index] = await thread_vector_cache.search(thread_id, corpus_version, embeddings_by_index[index], k)
+        if any(results[index] is None for index in pending):
+            _schedule_thread_matrix_load(thread_id, corpus_version)
+        else:
+            logger.info(f"Found document chunks for {len(pending)} queries of thread_id: {thread_id} in memory.")
+        pending = [index for index in pending if results[index] is None]
+
+    if pending:
+        chunks = await _search_chunks(
+            [queries[index] for index in pending],
+            [embeddings_by_index[index] for index in pending],
+            thread_id,
+            k,
+            ef_search,
+            probes,
+        )
+        for index, query_chunks in zip(pending, chunks):
+            results[index] = [_chunk_document(chunk) for chunk in query_chunks]
+            logger.info(
+                f"Found {len(query_chunks)} document chunks for query: {queries[index]} and thread_id: {thread_id} "
+                "in PGVector."
+            )
+
+    searched = list(embeddings_by_index)
+    if window > 0:
+        expanded = await _expand_windows([results[index] for index in searched], thread_id, window)  # type: ignore
+        for index, documents in zip(searched, expanded):
+            results[index] = documents
+
+    if cache_keys:
+        for index in searched:
+            put_cached_retrieval(cache_keys[index], results[index])  # type: ignore[arg-type]
+    return results  # type: ignore[return-value]
+
+
+async def search_documents_in_pgvector(
+    query: str,
+    thread_id: UUID,
+    k: int = 3,
+    window: int | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[Document]:
+    """
+    Search the chunks of a thread closest (cosine distance) to `query`, fused with a full-text search of the thread
+    when `hybrid_search` is enabled, so exact identifiers are found too.
+    Postgres serves the `thread_id` filter with its btree index or walks the ANN index, whichever is cheaper;
+    `ef_search` (HNSW) and `probes` (IVFFlat) override the recall settings for this query. With a quantized or
+    truncated index, the candidates it returns are rescored with the full-precision embeddings.
+    Results are cached until the chunks of the thread change. Without hybrid search, small threads are searched in
+    memory by `thread_vector_cache` when it is enabled.
+    Each of the `k` hits is followed by its `window` (default `retrieval_window_chunks`) neighbouring chunks on
+    each side, so small chunks can be matched precisely while the agent still gets their surrounding text.
+    """
+
+    return (
+        await search_documents_in_pgvector_batch([query], thread_id, k, window, ef_search=ef_search, probes=probes)
+    )[0]
 
 
-async def delete_document_from_pgvector(document_ids: list[str]) -> None:
-    """Delete documents from PGVector based on Document ID"""
+async def delete_document_chunks(document_id: UUID) -> int:
+    """Delete all chunks of a document from PGVector with a single indexed `DELETE`, returns the number deleted."""
 
-    logger.info(f"Attempting to delete {len(document_ids)} document chunks from PGVector.")
-    await vector_store.adelete(ids=document_ids)
-    logger.info(f"Successfully deleted {len(document_ids)} document chunks from PGVector.")
+    async with async_session() as session:
+        result = await session.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+        await bump_document_corpus_version(session, document_id, -result.rowcount)
+        await session.commit()
+    logger.info(f"Deleted {result.rowcount} chunks of document {document_id} from PGVector.")
+    return result.rowcount
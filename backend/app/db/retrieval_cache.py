@@ -0,0 +1,92 @@
+"""
+Retrieval result cache.
+
+Search results are cached in-process by (thread, normalized query, search parameters, corpus version). The corpus
+version of a thread (`threads.corpus_version`) is bumped in the same transaction as every write or delete of its
+chunks, by the API and the ingestion workers alike, so a cached result is never served once the chunks it was
+computed from have changed. A hit costs one primary key lookup instead of an embedding call and a vector search.
+The same transaction keeps `threads.chunk_count` up to date, so a thread without chunks is not searched at all.
+"""
+
+from typing import NamedTuple
+from uuid import UUID
+
+from langchain_core.documents import Document
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.db.embedding_cache import EmbeddingCacheStats, normalize_query
+from app.db.lru_cache import LRUCache
+from app.db.main import async_session
+from app.db.models import Document as DbDocument
+from app.db.models import Thread
+
+RetrievalKey = tuple[UUID, int, str, int, int, int | None, int | None]
+
+retrieval_cache: LRUCache[RetrievalKey, list[Document]] = LRUCache(
+    settings.retrieval_cache_size, settings.retrieval_cache_ttl_seconds
+)
+retrieval_stats = EmbeddingCacheStats()
+
+
+class CorpusStats(NamedTuple):
+    corpus_version: int
+    chunk_count: int
+
+
+async def get_corpus_stats(thread_id: UUID) -> CorpusStats | None:
+    """The current corpus version and chunk count of a thread, `None` when the thread does not exist."""
+
+    async with async_session() as session:
+        row = (
+            await session.execute(select(Thread.corpus_version, Thread.chunk_count).where(Thread.id == thread_id))
+        ).first()
+        return CorpusStats(*row) if row is not None else None
+
+
+async def bump_corpus_version(
+    connection: AsyncConnection | AsyncSession, thread_id: UUID, chunk_delta: int = 0
+) -> None:
+    """
+    Invalidate the cached retrievals of a thread and add `chunk_delta` to its chunk count,
+    call it in the transaction that changes its chunks.
+    """
+
+    await connection.execute(
+        update(Thread)
+        .where(Thread.id == thread_id)
+        .values(corpus_version=Thread.corpus_version + 1, chunk_count=Thread.chunk_count + chunk_delta)
+    )
+
+
+async def bump_document_corpus_version(
+    connection: AsyncConnection | AsyncSession, document_id: UUID, chunk_delta: int = 0
+) -> None:
+    """`bump_corpus_version` for the thread of a document."""
+
+    thread_id = select(DbDocument.thread_id).where(DbDocument.id == document_id).scalar_subquery()
+    await connection.execute(
+        update(Thread)
+        .where(Thread.id == thread_id)
+        .values(corpus_version=Thread.corpus_version + 1, chunk_count=Thread.chunk_count + chunk_delta)
+    )
+
+
+def retrieval_key(
+    thread_id: UUID, corpus_version: int, query: str, k: int, window: int, ef_search: int | None, probes: int | None
+) -> RetrievalKey:
+    return thread_id, corpus_version, normalize_query(query), k, window, ef_search, probes
+
+
+def get_cached_retrieval(key: RetrievalKey) -> list[Document] | None:
+    documents = retrieval_cache.get(key)
+    if documents is None:
+        retrieval_stats.misses += 1
+        return None
+    retrieval_stats.hits += 1
+    return list(documents)
+
+
+def put_cached_retrieval(key: RetrievalKey, documents: list[Document]) -> None:
+    retrieval_cache.put(key, list(documents))
@@ -0,0 +1,96 @@
+"""
+In-process brute-force vector search for small, hot threads.
+
+Most threads hold a few thousand chunks at most. For those, one matrix-vector product over the thread's normalized
+float32 embeddings is cheaper than a Postgres round trip. Threads of at most `thread_vector_cache_max_chunks` chunks
+are loaded after their first search and kept in an LRU bounded by `thread_vector_cache_max_mb`. An entry is only
+used while the thread's corpus version is unchanged, so chunk writes and deletes from any process invalidate it.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.db.embedding_cache import EmbeddingCacheStats
+
+
+@dataclass
+class ThreadMatrix:
+    corpus_version: int
+    documents: list[Document]
+    # One L2-normalized row per document, so cosine similarity is a dot product.
+    matrix: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(len(document.page_content) for document in self.documents)
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(thread_matrix: ThreadMatrix, query_embedding: list[float], k: int) -> list[Document]:
+    similarities = thread_matrix.matrix @ _normalized(np.asarray(query_embedding, dtype=np.float32))
+    if k < len(similarities):
+        candidates = np.argpartition(-similarities, k)[:k]
+    else:
+        candidates = np.arange(len(similarities))
+    return [thread_matrix.documents[i] for i in candidates[np.argsort(-similarities[candidates])]]
+
+
+class ThreadVectorCache:
+    """LRU of `ThreadMatrix` by thread, evicting the least recently searched threads beyond `max_bytes`."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.stats = EmbeddingCacheStats()
+        self._threads: OrderedDict[UUID, ThreadMatrix] = OrderedDict()
+
+    def __contains__(self, thread_id: UUID) -> bool:
+        return thread_id in self._threads
+
+    def _pop(self, thread_id: UUID) -> None:
+        thread_matrix = self._threads.pop(thread_id, None)
+        if thread_matrix is not None:
+            self.nbytes -= thread_matrix.nbytes
+
+    def put(
+        self, thread_id: UUID, corpus_version: int, documents: list[Document], embeddings: list[list[float]]
+    ) -> None:
+        matrix = _normalized(np.asarray(embeddings, dtype=np.float32).reshape(len(documents), -1))
+        thread_matrix = ThreadMatrix(corpus_version, documents, matrix)
+        self._pop(thread_id)
+        if thread_matrix.nbytes > self.max_bytes:
+            return
+        self._threads[thread_id] = thread_matrix
+        self.nbytes += thread_matrix.nbytes
+        while self.nbytes > self.max_bytes:
+            self._pop(next(iter(self._threads)))
+
+    async def search(
+        self, thread_id: UUID, corpus_version: int, query_embedding: list[float], k: int
+    ) -> list[Document] | None:
+        """The `k` documents closest to `query_embedding`, `None` when the thread is not resident or stale."""
+
+        thread_matrix = self._threads.get(thread_id)
+        if thread_matrix is None or thread_matrix.corpus_version != corpus_version:
+            self._pop(thread_id)
+            self.stats.misses += 1
+            return None
+        self._threads.move_to_end(thread_id)
+        self.stats.hits += 1
+        if len(thread_matrix.documents) * thread_matrix.matrix.shape[1] < 1_000_000:
+            return _top_k(thread_matrix, query_embedding, k)
+        # NumPy releases the GIL, larger products run in a thread to keep the event loop responsive.
+        return await asyncio.to_thread(_top_k, thread_matrix, query_embedding, k)
+
+
+thread_vector_cache = ThreadVectorCache(settings.thread_vector_cache_max_mb * 1024 * 1024)
@@ -0,0 +1,251 @@
+"""
+Approximate nearest neighbour index on `document_chunks.embedding`.
+
+The index type (`hnsw`, `ivfflat` or `none`) and its build parameters come from the settings. The index does not
+have to hold the full-precision vectors: with `vector_index_storage` it stores them as `halfvec` (2x smaller) or
+binary quantized (32x smaller), optionally truncated to their first `vector_index_dimensions` dimensions
+(Matryoshka embeddings such as `text-embedding-3-*` keep most of their quality when truncated). Searches then take
+`k * vector_search_rerank_factor` candidates from the index and rescore them with the full-precision vectors.
+
+pgvector indexes at most 2000 dimensions as `vector` and 4000 as `halfvec`, `auto` picks `halfvec` when needed.
+The index is rebuilt when its settings change, and searches set `ef_search` / `probes` per transaction.
+On a partitioned chunk table the index is defined on the parent, every partition (new ones included) gets its own.
+"""
+
+from uuid import UUID
+
+from loguru import logger
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+from sqlalchemy import ColumnElement, Float, Select, and_, cast, func, literal, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.config import settings
+from app.db.models import DocumentChunk
+
+VECTOR_INDEX_NAME = "ix_document_chunks_embedding"
+# Maximum dimensions pgvector can index per storage type.
+MAX_INDEX_DIMENSIONS = {"vector": 2000, "halfvec": 4000, "binary": 64000}
+# Arbitrary key of the advisory lock that stops the API and the workers from building the index at the same time.
+VECTOR_INDEX_LOCK_KEY = 7_340_215
+# Iterative index scans need pgvector 0.8.
+ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+
+# `(major, minor)` of the installed pgvector extension, read on the first search.
+_pgvector_version: tuple[int, int] | None = None
+
+
+def index_storage() -> str:
+    if settings.vector_index_storage != "auto":
+        return settings.vector_index_storage
+    return "vector" if index_dimensions() <= MAX_INDEX_DIMENSIONS["vector"] else "halfvec"
+
+
+def index_dimensions() -> int:
+    return min(settings.vector_index_dimensions or settings.embeddings_dimensions, settings.embeddings_dimensions)
+
+
+def needs_rescoring() -> bool:
+    """
+    Whether the index holds an approximation of the vectors that the candidates must be rescored against.
+    Without an index, searches scan the full-precision vectors and are exact already.
+    """
+    if settings.vector_index_type == "none":
+        return False
+    return index_storage() != "vector" or index_dimensions() < settings.embeddings_dimensions
+
+
+def _indexed_sql() -> tuple[str, str]:
+    """The indexed expression and its operator class, they must match `_indexed_expression` exactly."""
+
+    dimensions = index_dimensions()
+    column = "embedding"
+    if dimensions < settings.embeddings_dimensions:
+        column = f"subvector(embedding, 1, {dimensions})"
+    storage = index_storage()
+    if storage == "binary":
+        return f"(binary_quantize({column})::bit({dimensions}))", "bit_hamming_ops"
+    if storage == "halfvec":
+        return f"({column}::halfvec({dimensions}))", "halfvec_cosine_ops"
+    if column == "embedding":
+        return column, "vector_cosine_ops"
+    return f"({column}::vector({dimensions}))", "vector_cosine_ops"
+
+
+def _indexed_expression(vector: ColumnElement) -> ColumnElement:
+    dimensions = index_dimensions()
+    if dimensions < settings.embeddings_dimensions:
+        # Literal arguments, a bound parameter would keep Postgres from matching the index expression.
+        vector = func.subvector(vector, literal_column("1"), literal_column(str(dimensions)))
+    storage = index_storage()
+    if storage == "binary":
+        return cast(func.binary_quantize(vector), BIT(dimensions))
+    if storage == "halfvec":
+        return cast(vector, HALFVEC(dimensions))
+    return cast(vector, VECTOR(dimensions)) if dimensions < settings.embeddings_dimensions else vector
+
+
+def ann_distance(query_embedding: list[float]) -> ColumnElement[float]:
+    """Distance to `query_embedding` in the index space, written so that the ANN index can serve `ORDER BY` on it."""
+
+    indexed = _indexed_expression(DocumentChunk.embedding)
+    query = literal(query_embedding[: index_dimensions()], VECTOR(index_dimensions()))
+    if index_storage() == "binary":
+        return indexed.op("<~>", return_type=Float)(cast(func.binary_quantize(query), BIT(index_dimensions())))
+    if index_storage() == "halfvec":
+        query = cast(query, HALFVEC(index_dimensions()))
+    return indexed.op("<=>", return_type=Float)(query)
+
+
+def nearest_chunks_statement(
+    query_embedding: list[float], k: int, thread_id: UUID | None = None, name: str = ""
+) -> Select[tuple[DocumentChunk, float]]:
+    """
+    The `k` chunks closest (cosine distance) to `query_embedding`, with their distance, in order.
+    When the index holds approximated vectors, `k * vector_search_rerank_factor` candidates are taken from the index
+    and rescored with the full-precision vectors. `name` prefixes the CTE names, for several searches in a statement.
+    """
+
+    distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+    if not needs_rescoring():
+        statement = select(DocumentChunk, distance.label("distance"))
+        if thread_id is not None:
+            statement = statement.where(DocumentChunk.thread_id == thread_id)
+        return statement.order_by(distance).limit(k)
+
+    candidates = select(DocumentChunk.id, DocumentChunk.thread_id)
+    if thread_id is not None:
+        candidates = candidates.where(DocumentChunk.thread_id == thread_id)
+    candidates = (
+        candidates.order_by(ann_distance(query_embedding))
+        .limit(k * settings.vector_search_rerank_factor)
+        .cte(f"{name}candidates")
+        .prefix_with("MATERIALIZED")
+    )
+    return (
+        select(DocumentChunk, distance.label("distance"))
+        .join(candidates, and_(DocumentChunk.id == candidates.c.id, DocumentChunk.thread_id == candidates.c.thread_id))
+        .order_by(distance)
+        .limit(k)
+    )
+
+
+def index_signature() -> str:
+    """Identifies the index definition, stored as the index comment to detect settings changes."""
+
+    if settings.vector_index_type == "hnsw":
+        parameters = f"m={settings.vector_index_hnsw_m},ef_construction={settings.vector_index_hnsw_ef_construction}"
+    else:
+        parameters = f"lists={settings.vector_index_ivfflat_lists}"
+    return f"{settings.vector_index_type}:{index_storage()}({index_dimensions()}):{parameters}"
+
+
+def _concurrently() -> str:
+    # Indexes of partitioned tables cannot be built or dropped concurrently.
+    return "CONCURRENTLY" if settings.chunk_partitioning == "none" else ""
+
+
+def _create_index_statement() -> str:
+    column, opclass = _indexed_sql()
+    if settings.vector_index_type == "hnsw":
+        parameters = (
+            f"m = {settings.vector_index_hnsw_m}, ef_construction = {settings.vector_index_hnsw_ef_construction}"
+        )
+    else:
+        parameters = f"lists = {settings.vector_index_ivfflat_lists}"
+    return (
+        f"CREATE INDEX {_concurrently()} {VECTOR_INDEX_NAME} ON document_chunks "
+        f"USING {settings.vector_index_type} ({column} {opclass}) WITH ({parameters})"
+    )
+
+
+async def _current_index(conn: AsyncConnection) -> tuple[str | None, bool] | None:
+    """The comment and validity of the existing index, `None` when there is none."""
+
+    row = (
+        await conn.execute(
+            text(
+                """
+                SELECT obj_description(i.indexrelid, 'pg_class') AS signature, i.indisvalid AS is_valid
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = :index_name
+                """
+            ),
+            {"index_name": VECTOR_INDEX_NAME},
+        )
+    ).first()
+    return (row.signature, row.is_valid) if row is not None else None
+
+
+async def ensure_vector_index(engine: AsyncEngine) -> None:
+    """
+    Create the ANN index, or rebuild it when its settings changed or a previous build was interrupted.
+    The index is built `CONCURRENTLY` (unless the table is partitioned), so ingestion keeps writing chunks meanwhile.
+    """
+
+    max_dimensions = MAX_INDEX_DIMENSIONS[index_storage()]
+    if settings.vector_index_type != "none" and index_dimensions() > max_dimensions:
+        logger.warning(
+            f"pgvector cannot index {index_dimensions()} dimensions as {index_storage()} (at most {max_dimensions}), "
+            "searches will scan the chunks of the thread."
+        )
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": VECTOR_INDEX_LOCK_KEY}):
+            logger.info("The vector index is being managed by another process, skipping.")
+            return
+        try:
+            current = await _current_index(conn)
+            wanted = index_signature() if settings.vector_index_type != "none" else None
+            if current is not None and current == (wanted, True):
+                return
+
+            if current is not None:
+                logger.info(f"Dropping vector index {VECTOR_INDEX_NAME} ({current[0] or 'invalid'})...")
+                await conn.execute(text(f"DROP INDEX {_concurrently()} IF EXISTS {VECTOR_INDEX_NAME}"))
+            if wanted is None:
+                return
+
+            logger.info(f"Building vector index {VECTOR_INDEX_NAME} ({wanted}), this may take a while...")
+            await conn.execute(text(_create_index_statement()))
+            await conn.execute(text(f"COMMENT ON INDEX {VECTOR_INDEX_NAME} IS '{wanted}'"))
+            logger.info(f"✅ Vector index {VECTOR_INDEX_NAME} built successfully")
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": VECTOR_INDEX_LOCK_KEY})
+
+
+async def _supports_iterative_scan(session: AsyncSession) -> bool:
+    global _pgvector_version
+
+    if _pgvector_version is None:
+        version = await session.scalar(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+        major, minor = (version or "0.0").split(".")[:2]
+        _pgvector_version = (int(major), int(minor))
+        if _pgvector_version < ITERATIVE_SCAN_MIN_VERSION and settings.vector_search_iterative_scan != "off":
+            logger.warning(
+                f"pgvector {version} does not support iterative index scans, "
+                f"ignoring vector_search_iterative_scan={settings.vector_search_iterative_scan}."
+            )
+    return _pgvector_version >= ITERATIVE_SCAN_MIN_VERSION
+
+
+async def set_search_parameters(session: AsyncSession, ef_search: int | None = None, probes: int | None = None) -> None:
+    """
+    Set the recall / speed trade-off of the ANN index for the current transaction only.
+    Iterative scans keep filtered searches (one thread among many) from returning fewer than `k` chunks.
+    """
+
+    if settings.vector_index_type == "hnsw":
+        parameters = {"hnsw.ef_search": ef_search or settings.vector_search_ef_search}
+    elif settings.vector_index_type == "ivfflat":
+        parameters = {"ivfflat.probes": probes or settings.vector_search_probes}
+    else:
+        return
+    # Older pgvector versions reject the setting, which would fail the search.
+    if settings.vector_search_iterative_scan != "off" and await _supports_iterative_scan(session):
+        parameters[f"{settings.vector_index_type}.iterative_scan"] = settings.vector_search_iterative_scan
+
+    statement = "SELECT " + ", ".join(f"set_config('{name}', :{name.replace('.', '_')}, true)" for name in parameters)
+    await session.execute(text(statement), {name.replace(".", "_"): str(value) for name, value in parameters.items()})
@@ -1,97 +1,208 @@
-import shutil
+import asyncio
 from pathlib import Path
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, UploadFile, status
+from fastapi import APIRouter, HTTPException, Response, UploadFile, status
 from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import CurrentUserDep
-from app.config import BASE_DIR
-from app.db.main import SessionDep
-from app.db.pgvector_utils import (
-    DOCUMENT_LOADER_MAPPING,
-    delete_document_from_pgvector,
-    index_document_to_pgvector,
-    search_documents_in_pgvector,
-)
+from app.config import settings
+from app.db.document_parsing import DOCUMENT_LOADER_MAPPING
+from app.db.main import SessionDep, async_session
+from app.db.models import IngestionJobStatus
+from app.db.pgvector_utils import chunking_signature, clone_document_chunks, delete_document_chunks
 
 from . import service as document_service
-from .schemas import DocumentDeleteResponse, DocumentPublic, DocumentUploadResponse, DocumetCreate
+from .schemas import (
+    DocumentBatchUploadResponse,
+    DocumentBatchUploadResult,
+    DocumentDeleteResponse,
+    DocumentPublic,
+    DocumentUploadResponse,
+    DocumetCreate,
+    IngestionJobCreate,
+    IngestionJobPublic,
+)
+from .storage import UploadTooLargeError, store_upload
 
 document_router = APIRouter()
 
+# Shared by all batch uploads, so concurrent batches cannot open more than this many sessions and files at once.
+_upload_semaphore = asyncio.Semaphore(settings.upload_max_concurrency)
+
 
 @document_router.get("/{thread_id}", response_model=list[DocumentPublic])
 async def get_documents(thread_id: UUID, current_user: CurrentUserDep, session: SessionDep):
     return await document_service.get_documents(thread_id, session)
 
 
-@document_router.post("/upload/{thread_id}", response_model=DocumentUploadResponse)
-async def upload_document(thread_id: UUID, file: UploadFile, current_user: CurrentUserDep, session: SessionDep):
-    user_id = current_user.id
+async def _store_and_queue_upload(thread_id: UUID, file: UploadFile, user_id: UUID, session: AsyncSession) -> dict:
+    """
+    Store an uploaded file and queue it for indexing by the ingestion worker.
+    A file that was already indexed with the current settings reuses the existing chunks instead (`job_id` is None).
+    Raises:
+        HTTPException: 400 for a missing or unsupported file, 413 for a too large file, 500 for other errors.
+    """
     if file.filename is None:
         logger.error("No file uploaded.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded.")
 
     allowd_extensions = list(DOCUMENT_LOADER_MAPPING.keys())
     message = f"Unsupported file type. Allowed types: {', '.join(allowd_extensions)}"
-    if Path(file.filename).suffix not in allowd_extensions:
+    file_extension = Path(file.filename).suffix
+    if file_extension not in allowd_extensions:
         logger.error(message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
 
-    TEMP_DIR = BASE_DIR / "tmp"
-    if not TEMP_DIR.exists():
-        TEMP_DIR.mkdir()
-    temp_file_path = TEMP_DIR / file.filename
+    if not settings.upload_dir.exists():
+        settings.upload_dir.mkdir(parents=True, exist_ok=True)
+    max_upload_bytes = settings.max_upload_size_mb * 1024 * 1024
+    try:
+        stored_upload = await store_upload(file, settings.upload_dir, max_upload_bytes)
+    except UploadTooLargeError:
+        message = f"File '{file.filename}' exceeds the maximum upload size of {settings.max_upload_size_mb} MB."
+        logger.error(message)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=message)
+    stored_file_path = stored_upload.path
+    content_hash = stored_upload.content_hash
+    logger.info(f"File '{file.filename}' (sha256: {content_hash}) stored to '{stored_file_path}'.")
+
     document_id = None
-    chunk_ids = []
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        logger.info(f"File '{file.filename}' saved temporarily to '{temp_file_path}'.")
-        document_data = DocumetCreate(file_name=file.filename, thread_id=thread_id)
+        signature = chunking_signature()
+        indexed_document = await document_service.get_indexed_document_by_hash(
+            content_hash, signature, user_id, session
+        )
+        document_data = DocumetCreate(file_name=file.filename, thread_id=thread_id, content_hash=content_hash)
         new_document = await document_service.insert_document(document_data, session)
         document_id = new_document.id
-        chunk_ids = await index_document_to_pgvector(temp_file_path, document_id, thread_id, user_id)
-        logger.info(f"File '{file.filename}' (document_id: {document_id}) successfully indexed to PGVector.")
 
-        return {"document_id": document_id, "message": f"File {file.filename} uploaded and indexed successfully."}
+        if indexed_document is not None:
+            chunk_count = await clone_document_chunks(
+                indexed_document.id, document_id, thread_id, user_id, file.filename
+            )
+            if chunk_count:
+                await document_service.mark_document_indexed(new_document, signature, session)
+                stored_file_path.unlink()
+                logger.info(
+                    f"File '{file.filename}' (document_id: {document_id}) reused {chunk_count} chunks "
+                    f"of identical document {indexed_document.id}."
+                )
+                return {
+                    "document_id": document_id,
+                    "job_id": None,
+                    "status": IngestionJobStatus.COMPLETED,
+                    "message": f"File {file.filename} was already indexed, its {chunk_count} chunks were reused.",
+                }
+
+        job_data = IngestionJobCreate(
+            document_id=document_id,
+            thread_id=thread_id,
+            user_id=user_id,
+            file_name=file.filename,
+            file_path=str(stored_file_path),
+        )
+        new_job = await document_service.create_ingestion_job(job_data, session)
+        logger.info(f"File '{file.filename}' (document_id: {document_id}) queued as ingestion job {new_job.id}.")
+
+        return {
+            "document_id": document_id,
+            "job_id": new_job.id,
+            "status": new_job.status,
+            "message": f"File {file.filename} uploaded and queued for indexing.",
+        }
     except Exception as e:
         logger.error(f"An unexpected error occurred during upload of '{file.filename}': {e}", exc_info=True)
+        if stored_file_path.exists():
+            stored_file_path.unlink()
         if document_id is not None:
-            if chunk_ids:
-                try:
-                    await delete_document_from_pgvector(chunk_ids)
-                    logger.info(f"Attempted cleanup of PGVector for document {document_id} after unexpected error.")
-                except Exception as pgvector_clean_err:
-                    logger.error(
-                        f"Failed to cleanup PGVector for document {document_id} during error handling: {pgvector_clean_err}"
-                    )
             await document_service.delete_document(document_id, session)
             logger.info(f"Rolled back database record for document {document_id} due to unexpected error.")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred while uploading '{file.filename}'.",
         )
-    finally:
-        if temp_file_path.exists():
-            temp_file_path.unlink()
+
+
+@document_router.post(
+    "/upload/{thread_id}", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED
+)
+async def upload_document(
+    thread_id: UUID, file: UploadFile, response: Response, current_user: CurrentUserDep, session: SessionDep
+):
+    """
+    Store the uploaded file and queue it for indexing by the ingestion worker.
+    A file that was already indexed with the current settings reuses the existing chunks instead (201).
+    """
+    await document_service.check_thread_owner(thread_id, current_user.id, session)
+    result = await _store_and_queue_upload(thread_id, file, current_user.id, session)
+    if result["job_id"] is None:
+        response.status_code = status.HTTP_201_CREATED
+    return result
+
+
+@document_router.post("/upload/{thread_id}/batch", response_model=DocumentBatchUploadResponse)
+async def upload_documents(thread_id: UUID, files: list[UploadFile], current_user: CurrentUserDep, session: SessionDep):
+    """
+    Store many uploaded files concurrently and queue each of them for indexing.
+    The ingestion worker indexes the queued files in parallel (up to `ingestion_worker_concurrency` at a time),
+    so a batch takes about as long as its slowest file. A failing file does not fail the batch,
+    every file gets its own result with the status code a single upload would have returned.
+    """
+    if len(files) > settings.max_upload_batch_files:
+        message = f"Too many files in one upload, the maximum is {settings.max_upload_batch_files}."
+        logger.error(message)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
+    await document_service.check_thread_owner(thread_id, current_user.id, session)
+
+    def failed(file: UploadFile, status_code: int, message: str) -> DocumentBatchUploadResult:
+        return DocumentBatchUploadResult(
+            file_name=file.filename or "", status_code=status_code, status=IngestionJobStatus.FAILED, message=message
+        )
+
+    def unexpected_error(file: UploadFile, error: BaseException) -> DocumentBatchUploadResult:
+        logger.error(f"An unexpected error occurred during upload of '{file.filename}': {error!r}")
+        message = f"An unexpected error occurred while uploading '{file.filename}'."
+        return failed(file, status.HTTP_500_INTERNAL_SERVER_ERROR, message)
+
+    async def upload_one(file: UploadFile) -> DocumentBatchUploadResult:
+        try:
+            # Each file gets its own session, an `AsyncSession` must not be shared by concurrent tasks.
+            async with _upload_semaphore, async_session() as file_session:
+                result = await _store_and_queue_upload(thread_id, file, current_user.id, file_session)
+        except HTTPException as e:
+            return failed(file, e.status_code, e.detail)
+        except Exception as e:
+            return unexpected_error(file, e)
+        status_code = status.HTTP_201_CREATED if result["job_id"] is None else status.HTTP_202_ACCEPTED
+        return DocumentBatchUploadResult(file_name=file.filename or "", status_code=status_code, **result)
+
+    outcomes = await asyncio.gather(*(upload_one(file) for file in files), return_exceptions=True)
+    results = [
+        outcome if isinstance(outcome, DocumentBatchUploadResult) else unexpected_error(file, outcome)
+        for file, outcome in zip(files, outcomes)
+    ]
+    queued = sum(1 for result in results if result.job_id is not None)
+    logger.info(f"Batch upload to thread {thread_id}: {len(files)} files, {queued} queued for indexing.")
+    return {"results": results}
+
+
+@document_router.get("/jobs/{job_id}", response_model=IngestionJobPublic)
+async def get_ingestion_job(job_id: UUID, current_user: CurrentUserDep, session: SessionDep):
+    """Report the status and progress (chunks embedded so far) of an ingestion job."""
+    return await document_service.get_ingestion_job(job_id, current_user.id, session)
 
 
 @document_router.delete("/{document_id}", response_model=DocumentDeleteResponse)
 async def delete_document(document_id: UUID, current_user: CurrentUserDep, session: SessionDep):
     """Delete a document from the database and PGVector."""
-    chunk_message = ""
-    document_chunks = await search_documents_in_pgvector(filter={"document_id": str(document_id)})
-    if not document_chunks:
+    await document_service.get_user_document(document_id, current_user.id, session)
+    deleted_chunks = await delete_document_chunks(document_id)
+    if not deleted_chunks:
         logger.warning(f"Document chunks related to document {document_id} not found in PGVector.")
-    else:
-        doc_ids_to_delete = [doc.metadata["id"] for doc in document_chunks]
-        await delete_document_from_pgvector(doc_ids_to_delete)
-        logger.info(f"Successfully delete all document chunks related to document_id: {document_id} from PGVector.")
-        chunk_message = "all its chunks from PGVector."
     await document_service.delete_document(document_id, session)
     logger.info(f"Successfully deleted document {document_id} from database.")
     message = f"Successfully deleted document {document_id} from database"
 
-    return {"message": f"{message} and {chunk_message}."}
+    return {"message": f"{message} and its {deleted_chunks} chunks from PGVector."}
@@ -7,6 +7,8 @@ from pydantic import BaseModel, Field
 class DocumetCreate(BaseModel):
     file_name: str = Field(max_length=255)
     thread_id: UUID
+    content_hash: str | None = None
+    index_signature: str | None = None
 
 
 class DocumentPublic(BaseModel):
@@ -18,8 +20,48 @@ class DocumentPublic(BaseModel):
 
 class DocumentUploadResponse(BaseModel):
     document_id: UUID
+    job_id: UUID | None
+    status: str
     message: str
 
 
+class DocumentBatchUploadResult(BaseModel):
+    file_name: str
+    status_code: int
+    document_id: UUID | None = None
+    job_id: UUID | None = None
+    status: str
+    message: str
+
+
+class DocumentBatchUploadResponse(BaseModel):
+    results: list[DocumentBatchUploadResult]
+
+
 class DocumentDeleteResponse(BaseModel):
     message: str
+
+
+class IngestionJobCreate(BaseModel):
+    document_id: UUID
+    thread_id: UUID
+    user_id: UUID
+    file_name: str = Field(max_length=255)
+    file_path: str = Field(max_length=1024)
+
+
+class IngestionJobPublic(BaseModel):
+    id: UUID
+    document_id: UUID | None
+    thread_id: UUID
+    file_name: str
+    status: str
+    attempts: int
+    pages_total: int | None
+    pages_parsed: int
+    chunks_total: int | None
+    chunks_embedded: int
+    chunks_cached: int
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
@@ -5,9 +5,9 @@ from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Document
+from app.db.models import Document, IngestionJob, Thread
 
-from .schemas import DocumetCreate
+from .schemas import DocumetCreate, IngestionJobCreate
 
 
 async def get_documents(thread_id: UUID, session: AsyncSession) -> Sequence[Document]:
@@ -23,6 +23,61 @@ async def insert_document(document_data: DocumetCreate, session: AsyncSession) -
     return new_document
 
 
+async def mark_document_indexed(document: Document, index_signature: str, session: AsyncSession) -> Document:
+    document.index_signature = index_signature
+    await session.commit()
+    return document
+
+
+async def get_indexed_document_by_hash(
+    content_hash: str, index_signature: str, user_id: UUID, session: AsyncSession
+) -> Document | None:
+    """
+    Find a document of the same user with the same content that was fully indexed with the same settings.
+    Documents of other users are never matched, the response would tell whether they uploaded the same file.
+    """
+    statement = (
+        select(Document)
+        .join(Thread, Thread.id == Document.thread_id)
+        .where(
+            Document.content_hash == content_hash,
+            Document.index_signature == index_signature,
+            Thread.user_id == user_id,
+        )
+        .order_by(Document.uploaded_at)
+        .limit(1)
+    )
+    result = await session.execute(statement)
+    return result.scalar_one_or_none()
+
+
+async def check_thread_owner(thread_id: UUID, user_id: UUID, session: AsyncSession) -> None:
+    """Uploads to a thread of another user get the same 404 as a missing thread."""
+    owner_id = await session.scalar(select(Thread.user_id).where(Thread.id == thread_id))
+    if owner_id is None or owner_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Thread with ID {thread_id} not found.",
+        )
+
+
+async def get_user_document(document_id: UUID, user_id: UUID, session: AsyncSession) -> Document:
+    statement = select(Document, Thread.user_id).join(Thread, Thread.id == Document.thread_id)
+    row = (await session.execute(statement.where(Document.id == document_id))).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document with ID {document_id} not found.",
+        )
+    db_document, owner_id = row
+    if owner_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to delete this document.",
+        )
+    return db_document
+
+
 async def delete_document(document_id: UUID, session: AsyncSession) -> None:
     db_document = await session.get(Document, document_id)
     if db_document is None:
@@ -32,3 +87,25 @@ async def delete_document(document_id: UUID, session: AsyncSession) -> None:
         )
     await session.delete(db_document)
     await session.commit()
+
+
+async def create_ingestion_job(job_data: IngestionJobCreate, session: AsyncSession) -> IngestionJob:
+    new_job = IngestionJob(**job_data.model_dump())
+    session.add(new_job)
+    await session.commit()
+    return new_job
+
+
+async def get_ingestion_job(job_id: UUID, user_id: UUID, session: AsyncSession) -> IngestionJob:
+    db_job = await session.get(IngestionJob, job_id)
+    if db_job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingestion job with ID {job_id} not found.",
+        )
+    if db_job.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to get this ingestion job.",
+        )
+    return db_job
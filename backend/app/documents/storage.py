@@ -0,0 +1,49 @@
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import uuid4
+
+import anyio
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    content_hash: str
+
+
+async def store_upload(file: UploadFile, directory: Path, max_bytes: int) -> StoredUpload:
+    """
+    Stream an upload to a unique file in `directory`, hashing it in the same pass.
+    Memory use is bounded by `UPLOAD_CHUNK_SIZE` whatever the file size, and file I/O runs off the event loop.
+    Raises:
+        UploadTooLargeError: As soon as more than `max_bytes` have been read; the partial file is removed.
+    """
+
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(f"File is larger than {max_bytes} bytes.")
+
+    path = directory / f"{uuid4()}{Path(file.filename or '').suffix}"
+    file_hash = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"File is larger than {max_bytes} bytes.")
+                file_hash.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    return StoredUpload(path=path, size=size, content_hash=file_hash.hexdigest())
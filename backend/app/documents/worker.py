@@ -0,0 +1,218 @@
+"""
+Ingestion worker entry point.
+
+Claims queued ingestion jobs from Postgres with `FOR UPDATE SKIP LOCKED` and indexes their documents, so ingestion
+can be scaled on its own nodes independently of the chat API. Every `gc_interval_seconds` (0 disables it)
+it also runs the orphan garbage collector of `app.db.gc` and prunes old checkpoints with `app.db.checkpoint_retention`:
+
+    python -m app.documents.worker
+"""
+
+import asyncio
+import signal
+from datetime import timedelta
+from pathlib import Path
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, select, update
+
+from app.config import settings
+from app.db import embedding_cache
+from app.db.checkpoint_retention import prune_checkpoints
+from app.db.document_parsing import shutdown_parse_executor
+from app.db.gc import collect_garbage
+from app.db.main import async_session, init_db
+from app.db.models import Document, DocumentChunk, IngestionJob, IngestionJobStatus
+from app.db.pgvector_utils import (
+    IndexingProgress,
+    chunking_signature,
+    index_document_to_pgvector,
+)
+from app.db.retrieval_cache import bump_corpus_version
+
+
+async def claim_next_job() -> IngestionJob | None:
+    """Atomically claim the oldest pending job, or a running job whose lease has expired."""
+
+    lease_expired = IngestionJob.updated_at < func.now() - timedelta(seconds=settings.ingestion_job_lease_seconds)
+    statement = (
+        select(IngestionJob)
+        .where(
+            or_(
+                IngestionJob.status == IngestionJobStatus.PENDING,
+                and_(IngestionJob.status == IngestionJobStatus.RUNNING, lease_expired),
+            )
+        )
+        .order_by(IngestionJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    async with async_session() as session:
+        job = (await session.execute(statement)).scalar_one_or_none()
+        if job is None:
+            return None
+        job.status = IngestionJobStatus.RUNNING
+        job.attempts += 1
+        await session.commit()
+        return job
+
+
+async def _update_job(job_id: UUID, **values) -> None:
+    async with async_session() as session:
+        await session.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**values))
+        await session.commit()
+
+
+async def _heartbeat(job_id: UUID) -> None:
+    """Keep the job lease alive so other workers do not reclaim a long-running job."""
+
+    while True:
+        await asyncio.sleep(settings.ingestion_job_lease_seconds / 3)
+        try:
+            await _update_job(job_id, updated_at=func.now())
+        except Exception as e:
+            logger.warning(f"Failed to refresh the lease of ingestion job {job_id}: {e}")
+
+
+async def _finish_job(job: IngestionJob, status: IngestionJobStatus, error: str | None = None) -> None:
+    await _update_job(job.id, status=status, error=error)
+    file_path = Path(job.file_path)
+    if file_path.exists():
+        file_path.unlink()
+
+
+async def _fail_job(job: IngestionJob, error: str) -> None:
+    """
+    Put the job back in the queue, keeping the chunks written so far for the next attempt to resume from,
+    or fail it for good (removing its chunks and document) once out of attempts.
+    """
+
+    if job.attempts < settings.ingestion_max_attempts:
+        logger.warning(f"Ingestion job {job.id} failed (attempt {job.attempts}), requeueing: {error}")
+        await _update_job(job.id, status=IngestionJobStatus.PENDING, error=error)
+        return
+
+    logger.error(f"Ingestion job {job.id} failed after {job.attempts} attempts: {error}")
+    await _finish_job(job, IngestionJobStatus.FAILED, error)
+    if job.document_id is not None:
+        async with async_session() as session:
+            db_document = await session.get(Document, job.document_id)
+            if db_document is not None:
+                chunk_count = await session.scalar(
+                    select(func.count()).select_from(DocumentChunk).where(DocumentChunk.document_id == job.document_id)
+                )
+                await bump_corpus_version(session, db_document.thread_id, -(chunk_count or 0))
+                await session.delete(db_document)
+                await session.commit()
+                logger.info(f"Removed document {job.document_id} and its chunks after failed ingestion.")
+
+
+async def process_job(job: IngestionJob) -> None:
+    logger.info(f"Processing ingestion job {job.id} for '{job.file_name}' (attempt {job.attempts}).")
+    if job.document_id is None:
+        await _finish_job(job, IngestionJobStatus.FAILED, "Document was deleted before it could be indexed.")
+        return
+    if job.attempts > settings.ingestion_max_attempts:
+        await _fail_job(job, job.error or "Ingestion job exceeded its maximum number of attempts.")
+        return
+
+    async def report_progress(progress: IndexingProgress) -> None:
+        await _update_job(
+            job.id,
+            pages_total=progress.pages_total,
+            pages_parsed=progress.pages_parsed,
+            chunks_total=progress.chunks_total,
+            chunks_embedded=progress.chunks_embedded,
+            chunks_cached=progress.chunks_cached,
+        )
+
+    heartbeat = asyncio.create_task(_heartbeat(job.id))
+    try:
+        await index_document_to_pgvector(
+            Path(job.file_path),
+            job.document_id,
+            job.thread_id,
+            job.user_id,
+            file_name=job.file_name,
+            on_progress=report_progress,
+            resume=job.attempts > 1,
+        )
+    except Exception as e:
+        logger.error(f"Error while indexing '{job.file_name}' for ingestion job {job.id}: {e}")
+        await _fail_job(job, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+
+    async with async_session() as session:
+        await session.execute(
+            update(Document).where(Document.id == job.document_id).values(index_signature=chunking_signature())
+        )
+        await session.commit()
+    await _finish_job(job, IngestionJobStatus.COMPLETED)
+    logger.info(f"Ingestion job {job.id} completed: '{job.file_name}' (document_id: {job.document_id}) indexed.")
+    cache_stats = embedding_cache.stats
+    logger.info(
+        f"Embedding cache: {cache_stats.hits} hits, {cache_stats.misses} misses "
+        f"(hit rate {cache_stats.hit_rate:.1%}) since worker start."
+    )
+
+
+async def _worker_loop(slot: int, stop_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            job = await claim_next_job()
+        except Exception as e:
+            logger.error(f"Worker slot {slot} failed to claim an ingestion job: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=settings.ingestion_poll_interval_seconds)
+            except TimeoutError:
+                pass
+            continue
+
+        await process_job(job)
+
+
+async def _gc_loop(stop_event: asyncio.Event) -> None:
+    if settings.gc_interval_seconds <= 0:
+        return
+    while True:
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.gc_interval_seconds)
+            return
+        except TimeoutError:
+            pass
+        try:
+            await collect_garbage()
+        except Exception as e:
+            logger.error(f"Garbage collection failed: {e}")
+        try:
+            await prune_checkpoints()
+        except Exception as e:
+            logger.error(f"Checkpoint pruning failed: {e}")
+
+
+async def run_worker() -> None:
+    await init_db()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    logger.info(f"Ingestion worker started with {settings.ingestion_worker_concurrency} slot(s).")
+    try:
+        await asyncio.gather(
+            *(_worker_loop(slot, stop_event) for slot in range(settings.ingestion_worker_concurrency)),
+            _gc_loop(stop_event),
+        )
+    finally:
+        shutdown_parse_executor()
+    logger.info("Ingestion worker stopped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
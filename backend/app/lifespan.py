@@ -3,7 +3,8 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from loguru import logger
 
-from app.db.checkpointer import close_connection, create_connection
+from app.chat.langgraph_agent import agent_registry
+from app.db.checkpointer import close_pool, get_checkpointer
 from app.db.main import init_db
 
 
@@ -11,7 +12,8 @@ from app.db.main import init_db
 async def lifespan(app: FastAPI):
     logger.info("Running lifespan before the application startup!")
     await init_db()
-    await create_connection()
+    app.state.checkpointer = await get_checkpointer()
+    agent_registry.build(app.state.checkpointer)
     yield
     logger.info("Running lifespan after the application shutdown!")
-    await close_connection()
+    await close_pool()
@@ -2,8 +2,10 @@ from fastapi import FastAPI
 
 from app.auth.routes import auth_router
 from app.chat.routes import chat_router
+from app.config import settings
 from app.documents.routes import document_router
 from app.lifespan import lifespan
+from app.metrics.routes import metrics_router
 from app.middleware import register_middleware
 from app.threads.routes import thread_router
 from app.users.routes import user_router
@@ -29,3 +31,5 @@ app.include_router(user_router, prefix=f"{version_prefix}/users", tags=["USERS"]
 app.include_router(thread_router, prefix=f"{version_prefix}/threads", tags=["THREADS"])
 app.include_router(chat_router, prefix=f"{version_prefix}/chat", tags=["CHAT"])
 app.include_router(document_router, prefix=f"{version_prefix}/documents", tags=["DOCUMENTS"])
+if settings.metrics_enabled:
+    app.include_router(metrics_router, prefix=f"{version_prefix}/metrics", tags=["METRICS"])
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from app.auth.dependencies import CurrentUserDep
+from app.db.main import SessionDep
+
+from . import service as metrics_service
+from .schemas import MetricsResponse
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/", response_model=MetricsResponse)
+async def get_metrics(current_user: CurrentUserDep, session: SessionDep):
+    """Performance counters, e.g. the embedding cache hit rate."""
+    return await metrics_service.get_metrics(session)
@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+
+
+class CacheMetrics(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class ConnectionPoolMetrics(BaseModel):
+    min_size: int
+    max_size: int
+    size: int
+    available: int
+    requests_waiting: int
+    requests_num: int
+    requests_queued: int
+    requests_wait_ms: int
+    requests_errors: int
+    connections_lost: int
+
+
+class TableStorageMetrics(BaseModel):
+    rows: int
+    bytes: int
+
+
+class MetricsResponse(BaseModel):
+    embedding_cache: CacheMetrics
+    query_embedding_cache: CacheMetrics
+    retrieval_cache: CacheMetrics
+    thread_vector_cache: CacheMetrics
+    checkpointer_pool: ConnectionPoolMetrics | None = None
+    checkpoint_storage: dict[str, TableStorageMetrics]
+    checkpoints_pruned: dict[str, TableStorageMetrics]
@@ -0,0 +1,66 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.checkpoint_retention import checkpoint_storage, pruned_totals
+from app.db.checkpointer import get_pool_stats
+from app.db.embedding_cache import query_stats
+from app.db.models import IngestionJob
+from app.db.retrieval_cache import retrieval_stats
+from app.db.thread_vector_cache import thread_vector_cache
+
+from .schemas import CacheMetrics, ConnectionPoolMetrics, MetricsResponse, TableStorageMetrics
+
+
+def _cache_metrics(hits: int, misses: int) -> CacheMetrics:
+    lookups = hits + misses
+    return CacheMetrics(hits=hits, misses=misses, hit_rate=hits / lookups if lookups else 0.0)
+
+
+async def get_embedding_cache_metrics(session: AsyncSession) -> CacheMetrics:
+    """Chunk embedding cache hits across all ingestion workers, as recorded on the ingestion jobs."""
+
+    statement = select(
+        func.coalesce(func.sum(IngestionJob.chunks_cached), 0),
+        func.coalesce(func.sum(IngestionJob.chunks_embedded), 0),
+    )
+    chunks_cached, chunks_embedded = (await session.execute(statement)).one()
+    return _cache_metrics(chunks_cached, chunks_embedded - chunks_cached)
+
+
+def get_checkpointer_pool_metrics() -> ConnectionPoolMetrics | None:
+    stats = get_pool_stats()
+    if stats is None:
+        return None
+    return ConnectionPoolMetrics(
+        min_size=stats["pool_min"],
+        max_size=stats["pool_max"],
+        size=stats["pool_size"],
+        available=stats["pool_available"],
+        requests_waiting=stats["requests_waiting"],
+        # Cumulative counters, left out by `psycopg_pool` while zero.
+        requests_num=stats.get("requests_num", 0),
+        requests_queued=stats.get("requests_queued", 0),
+        requests_wait_ms=stats.get("requests_wait_ms", 0),
+        requests_errors=stats.get("requests_errors", 0),
+        connections_lost=stats.get("connections_lost", 0),
+    )
+
+
+async def get_metrics(session: AsyncSession) -> MetricsResponse:
+    return MetricsResponse(
+        embedding_cache=await get_embedding_cache_metrics(session),
+        # Counted by this API process only.
+        query_embedding_cache=_cache_metrics(query_stats.hits, query_stats.misses),
+        retrieval_cache=_cache_metrics(retrieval_stats.hits, retrieval_stats.misses),
+        thread_vector_cache=_cache_metrics(thread_vector_cache.stats.hits, thread_vector_cache.stats.misses),
+        checkpointer_pool=get_checkpointer_pool_metrics(),
+        # Shrinks as `checkpoint_retention` prunes, once vacuum has reclaimed the space.
+        checkpoint_storage={
+            table: TableStorageMetrics(rows=rows, bytes=size)
+            for table, (rows, size) in (await checkpoint_storage()).items()
+        },
+        # Totals deleted by the checkpoint pruner of every worker.
+        checkpoints_pruned={
+            table: TableStorageMetrics(rows=rows, bytes=size) for table, (rows, size) in (await pruned_totals()).items()
+        },
+    )
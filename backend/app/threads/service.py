@@ -8,7 +8,7 @@ from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Thread
-from app.db.pgvector_utils import delete_document_from_pgvector, search_documents_in_pgvector
+from app.db.partitioning import drop_thread_partition
 
 from .schemas import ThreadUpdate
 
@@ -74,6 +74,8 @@ async def delete_thread(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to delete this thread.",
         )
+    # With per-thread partitions, dropping the partition is much cheaper than cascading the delete to every chunk.
+    await drop_thread_partition(await session.connection(), thread_id)
     await session.delete(db_thread)
     await session.commit()
 
@@ -83,15 +85,3 @@ async def delete_thread(
         logger.info(f"Successfully deleted thread {thread_id} from checkpointer (chat messages)")
     except Exception as e:
         logger.error(f"Failed to delete thread {thread_id} from checkpointer (chat messages): {str(e)}")
-
-    try:
-        logger.info(f"Attempting to delete documents related to thread_id {thread_id}")
-        document_chunks = await search_documents_in_pgvector(filter={"thread_id": str(thread_id)})
-        if not document_chunks:
-            logger.warning(f"Document chunks related to thread {thread_id} not found in PGVector.")
-        else:
-            doc_ids_to_delete = [doc.metadata["id"] for doc in document_chunks]
-            await delete_document_from_pgvector(doc_ids_to_delete)
-            logger.info(f"Successfully deleted all document chunks related to thread_id: {thread_id} from PGVector.")
-    except Exception as e:
-        logger.error(f"Failed to delete documents related to thread {thread_id} from PGVector: {str(e)}")
@@ -0,0 +1,93 @@
+"""
+Checkpointed turns per second with concurrent threads, on a single shared connection vs. the checkpointer pool.
+
+Each simulated thread runs `--turns` turns of a one-node graph compiled with the checkpointer, so a turn does the
+same checkpoint reads and writes as a chat turn without calling a model. `AsyncPostgresSaver` serializes all calls
+on a single connection, so its throughput stays flat; with the pool it should grow with the concurrency up to
+`CHECKPOINTER_POOL_MAX_SIZE`. The benchmark threads are deleted afterwards.
+
+    cd backend
+    python -m benchmarks.checkpointer_pool --concurrency 1 8 32 --turns 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import TypedDict
+from uuid import uuid4
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.graph import START, StateGraph
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+from app.config import settings
+from app.db.checkpointer import close_pool, create_pool, get_checkpointer, get_pool_stats
+from benchmarks.vector_recall import _p95
+
+
+class TurnState(TypedDict):
+    turns: int
+
+
+def _step(state: TurnState) -> TurnState:
+    return {"turns": state.get("turns", 0) + 1}
+
+
+async def _run(checkpointer: AsyncPostgresSaver, concurrency: int, turns: int) -> tuple[float, list[float]]:
+    """Turns per second and per-turn latencies (ms) of `concurrency` threads taking `turns` turns each."""
+
+    builder = StateGraph(TurnState)
+    builder.add_node("step", _step)
+    builder.add_edge(START, "step")
+    graph = builder.compile(checkpointer=checkpointer)
+    thread_ids = [str(uuid4()) for _ in range(concurrency)]
+    latencies: list[float] = []
+
+    async def thread(thread_id: str) -> None:
+        config = {"configurable": {"thread_id": thread_id}}
+        for _ in range(turns):
+            started = time.perf_counter()
+            await graph.ainvoke({"turns": 0}, config)  # type: ignore[arg-type]
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(thread(thread_id) for thread_id in thread_ids))
+    elapsed = time.perf_counter() - started
+    for thread_id in thread_ids:
+        await checkpointer.adelete_thread(thread_id)
+    return concurrency * turns / elapsed, latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16, 64])
+    parser.add_argument("--turns", type=int, default=20, help="Turns per thread")
+    args = parser.parse_args()
+
+    pooled = await get_checkpointer()
+    connection = await AsyncConnection.connect(
+        conninfo=settings.checkpointer_uri, autocommit=True, prepare_threshold=0, row_factory=dict_row
+    )
+    single = AsyncPostgresSaver(conn=connection)  # type: ignore[arg-type]
+
+    pool = await create_pool()
+    print(f"{args.turns} turns per thread, pool of {pool.min_size}-{pool.max_size} connections")
+    print(f"{'checkpointer':<14}{'threads':>8}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    try:
+        for concurrency in args.concurrency:
+            for name, checkpointer in (("connection", single), ("pool", pooled)):
+                throughput, latencies = await _run(checkpointer, concurrency, args.turns)
+                print(
+                    f"{name:<14}{concurrency:>8}{throughput:>10.1f}"
+                    f"{statistics.median(latencies):>10.2f}{_p95(latencies):>10.2f}"
+                )
+        print(f"Pool stats: {get_pool_stats()}")
+    finally:
+        await connection.close()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Event loop lag while a large document is parsed, inline on the loop vs. in the parsing process pool.
+
+A ticker coroutine stands in for a concurrent chat stream: it wakes up every `--tick-ms` and records how late it
+was. With inline parsing the lag grows to the full parsing time; with the pool it should stay flat.
+
+    cd backend
+    python -m benchmarks.parse_event_loop_lag --file path/to/large.pdf
+    python -m benchmarks.parse_event_loop_lag  # generates a large .txt file
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.db.document_parsing import (
+    DOCUMENT_LOADER_MAPPING,
+    load_and_split_document,
+    shutdown_parse_executor,
+    text_splitter,
+)
+
+
+async def _inline_load_and_split(file_path: Path) -> int:
+    """The previous behaviour: loader and splitter run on the event loop."""
+    loader = DOCUMENT_LOADER_MAPPING[file_path.suffix.lower()](file_path)  # type: ignore
+    documents = await loader.aload()
+    return len(text_splitter.split_documents(documents))
+
+
+async def _pool_load_and_split(file_path: Path) -> int:
+    return len(await load_and_split_document(file_path))
+
+
+async def _measure(parse, file_path: Path, tick_ms: float) -> dict:
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        interval = tick_ms / 1000
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - started - interval) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    # Let the ticker start its first sleep, so a parse that never yields still shows up as one late tick.
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    chunks = await parse(file_path)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+
+    # Guards against an empty sample, the lag is then too small to measure.
+    lags = sorted(lags) or [0.0]
+    return {
+        "chunks": chunks,
+        "parse_s": elapsed,
+        "lag_p50_ms": statistics.median(lags),
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] if len(lags) >= 100 else lags[-1],
+        "lag_max_ms": lags[-1],
+    }
+
+
+def _generate_text_file(directory: Path, size_mb: int) -> Path:
+    file_path = directory / "benchmark.txt"
+    paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt. " * 10
+    with open(file_path, "w") as f:
+        for _ in range(size_mb * 1024 * 1024 // (len(paragraph) + 2)):
+            f.write(paragraph + "\n\n")
+    return file_path
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, help="Document to parse (default: a generated .txt file)")
+    parser.add_argument("--size-mb", type=int, default=20, help="Size of the generated .txt file")
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = args.file or _generate_text_file(Path(tmp_dir), args.size_mb)
+        print(f"Parsing {file_path} ({file_path.stat().st_size / 1024 / 1024:.1f} MB)")
+        # Warm up the pool so process start-up is not counted.
+        await load_and_split_document(file_path)
+
+        print(f"{'mode':<8}{'chunks':>8}{'parse s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+        for mode, parse in (("inline", _inline_load_and_split), ("pool", _pool_load_and_split)):
+            result = await _measure(parse, file_path, args.tick_ms)
+            print(
+                f"{mode:<8}{result['chunks']:>8}{result['parse_s']:>10.2f}{result['lag_p50_ms']:>12.2f}"
+                f"{result['lag_p99_ms']:>12.2f}{result['lag_max_ms']:>12.2f}"
+            )
+    shutdown_parse_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
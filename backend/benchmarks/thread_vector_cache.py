@@ -0,0 +1,100 @@
+"""
+Latency of searching a small thread in memory (`thread_vector_cache`) vs. with pgvector, and the overlap of results.
+
+Queries are stored chunk embeddings of the thread with a little gaussian noise, so no embedding provider is needed.
+By default the largest thread within `THREAD_VECTOR_CACHE_MAX_CHUNKS` is used:
+
+    cd backend
+    python -m benchmarks.thread_vector_cache --queries 200 --k 3
+    python -m benchmarks.thread_vector_cache --thread-id <thread UUID>
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import UUID
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.db.main import async_session, engine
+from app.db.models import DocumentChunk
+from app.db.pgvector_utils import _load_thread_matrix
+from app.db.retrieval_cache import get_corpus_stats
+from app.db.thread_vector_cache import thread_vector_cache
+from app.db.vector_index import nearest_chunks_statement, set_search_parameters
+from benchmarks.vector_recall import _p95, _sample_queries
+
+
+async def _pick_thread() -> UUID | None:
+    chunk_count = func.count().label("chunk_count")
+    statement = (
+        select(DocumentChunk.thread_id, chunk_count)
+        .group_by(DocumentChunk.thread_id)
+        .having(chunk_count <= settings.thread_vector_cache_max_chunks)
+        .order_by(chunk_count.desc())
+        .limit(1)
+    )
+    async with async_session() as session:
+        return await session.scalar(statement)
+
+
+async def _pgvector_search(query: list[float], k: int, thread_id: UUID) -> tuple[list[str], float]:
+    started = time.perf_counter()
+    async with async_session() as session:
+        await set_search_parameters(session)
+        rows = (await session.execute(nearest_chunks_statement(query, k, thread_id=thread_id))).all()
+    ids = [str(row.DocumentChunk.id) for row in sorted(rows, key=lambda row: row.distance)]
+    return ids, (time.perf_counter() - started) * 1000
+
+
+async def _memory_search(query: list[float], k: int, thread_id: UUID, corpus_version: int) -> tuple[list[str], float]:
+    started = time.perf_counter()
+    documents = await thread_vector_cache.search(thread_id, corpus_version, query, k) or []
+    return [document.id for document in documents], (time.perf_counter() - started) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.01, help="Standard deviation added to sampled vectors")
+    parser.add_argument("--thread-id", type=UUID, help="Thread to search, default: the largest one that fits")
+    args = parser.parse_args()
+
+    thread_id = args.thread_id or await _pick_thread()
+    corpus_stats = await get_corpus_stats(thread_id) if thread_id else None
+    corpus_version = corpus_stats.corpus_version if corpus_stats is not None else None
+    if thread_id is None or corpus_version is None:
+        print("No thread to search, index some documents first.")
+        return
+    started = time.perf_counter()
+    await _load_thread_matrix(thread_id, corpus_version)
+    load_ms = (time.perf_counter() - started) * 1000
+    if thread_id not in thread_vector_cache:
+        print(f"Thread {thread_id} does not fit in the cache (THREAD_VECTOR_CACHE_MAX_CHUNKS / _MAX_MB).")
+        return
+    queries = await _sample_queries(args.queries, args.noise, thread_id)
+
+    overlaps, pgvector_latencies, memory_latencies = [], [], []
+    for query in queries:
+        pgvector_ids, pgvector_latency = await _pgvector_search(query, args.k, thread_id)
+        memory_ids, memory_latency = await _memory_search(query, args.k, thread_id, corpus_version)
+        overlaps.append(len(set(pgvector_ids) & set(memory_ids)) / len(pgvector_ids) if pgvector_ids else 1.0)
+        pgvector_latencies.append(pgvector_latency)
+        memory_latencies.append(memory_latency)
+
+    print(
+        f"Thread {thread_id}: {len(thread_vector_cache._threads[thread_id].documents)} chunks, "
+        f"{thread_vector_cache.nbytes / 1024 / 1024:.1f} MB in memory, loaded in {load_ms:.0f} ms"
+    )
+    print(f"{len(queries)} queries, k={args.k}, overlap of results: {statistics.mean(overlaps):.3f}")
+    print(f"{'search':<12}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, latencies in (("pgvector", pgvector_latencies), ("in-memory", memory_latencies)):
+        print(f"{label:<12}{statistics.median(latencies):>10.3f}{_p95(latencies):>10.3f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
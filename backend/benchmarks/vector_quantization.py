@@ -0,0 +1,89 @@
+"""
+Index size, recall@k and latency of the ANN index for each storage mode (`vector`, `halfvec`, `binary`) and
+truncated dimensions, against exact full-precision search.
+
+Each variant rebuilds the vector index, so run it against a staging copy of the database, not a live one.
+The index matching the current settings is rebuilt at the end.
+
+    cd backend
+    python -m benchmarks.vector_quantization --queries 100 --k 10
+    python -m benchmarks.vector_quantization --storage halfvec binary --dimensions 3072 1024 512 --rerank-factor 4 10
+"""
+
+import argparse
+import asyncio
+import statistics
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.main import engine
+from app.db.vector_index import MAX_INDEX_DIMENSIONS, VECTOR_INDEX_NAME, ensure_vector_index, index_signature
+from benchmarks.vector_recall import _p95, _sample_queries, _search
+
+
+async def _index_size() -> int:
+    """Size of the vector index, summed over its partitions when the chunk table is partitioned."""
+
+    async with engine.connect() as conn:
+        return (
+            await conn.scalar(
+                text(
+                    f"""
+                    SELECT coalesce(sum(pg_relation_size(relid)), 0)
+                    FROM pg_partition_tree(to_regclass('{VECTOR_INDEX_NAME}'))
+                    """
+                )
+            )
+            or 0
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.01, help="Standard deviation added to sampled vectors")
+    parser.add_argument("--storage", nargs="*", default=["vector", "halfvec", "binary"])
+    parser.add_argument("--dimensions", type=int, nargs="*", default=[settings.embeddings_dimensions, 1024, 512])
+    parser.add_argument("--rerank-factor", type=int, nargs="*", default=[settings.vector_search_rerank_factor])
+    args = parser.parse_args()
+
+    queries = await _sample_queries(args.queries, args.noise, None)
+    if not queries:
+        print("No chunks to query, index some documents first.")
+        return
+    exact_results = [set((await _search(query, args.k, None, True, None, None))[0]) for query in queries]
+
+    original = (settings.vector_index_storage, settings.vector_index_dimensions, settings.vector_search_rerank_factor)
+    print(f"{len(queries)} queries, k={args.k}")
+    print(f"{'index':<50}{'rerank':>8}{'size MB':>10}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    try:
+        for storage in args.storage:
+            for dimensions in args.dimensions:
+                if dimensions > min(settings.embeddings_dimensions, MAX_INDEX_DIMENSIONS[storage]):
+                    continue
+                settings.vector_index_storage = storage
+                settings.vector_index_dimensions = dimensions
+                await ensure_vector_index(engine)
+                size_mb = await _index_size() / 1024 / 1024
+                for rerank_factor in args.rerank_factor:
+                    settings.vector_search_rerank_factor = rerank_factor
+                    recalls, latencies = [], []
+                    for query, exact in zip(queries, exact_results):
+                        ids, latency = await _search(query, args.k, None, False, None, None)
+                        recalls.append(len(exact.intersection(ids)) / len(exact) if exact else 1.0)
+                        latencies.append(latency)
+                    recall, p50 = statistics.mean(recalls), statistics.median(latencies)
+                    print(
+                        f"{index_signature():<50}{rerank_factor:>8}{size_mb:>10.1f}"
+                        f"{recall:>10.3f}{p50:>10.2f}{_p95(latencies):>10.2f}"
+                    )
+    finally:
+        settings.vector_index_storage, settings.vector_index_dimensions, settings.vector_search_rerank_factor = original
+        await ensure_vector_index(engine)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Recall@k and latency of the ANN index on `document_chunks` against exact search.
+
+Queries are stored chunk embeddings with a little gaussian noise, so no embedding provider is needed. Exact results
+come from the same query with index scans disabled. Run against a database that already holds indexed chunks:
+
+    cd backend
+    python -m benchmarks.vector_recall --queries 100 --k 10 --ef-search 10 40 100 200
+    python -m benchmarks.vector_recall --probes 1 5 10 20  # with VECTOR_INDEX_TYPE=ivfflat
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func, select, text
+
+from app.config import settings
+from app.db.main import async_session, engine
+from app.db.models import DocumentChunk
+from app.db.vector_index import index_signature, nearest_chunks_statement, set_search_parameters
+
+
+async def _sample_queries(count: int, noise: float, thread_id: UUID | None) -> list[list[float]]:
+    statement = select(DocumentChunk.embedding).order_by(func.random()).limit(count)
+    if thread_id is not None:
+        statement = statement.where(DocumentChunk.thread_id == thread_id)
+    async with async_session() as session:
+        vectors = (await session.execute(statement)).scalars().all()
+    rng = np.random.default_rng(0)
+    return [(np.asarray(vector) + rng.normal(0, noise, len(vector))).tolist() for vector in vectors]
+
+
+async def _search(
+    query: list[float], k: int, thread_id: UUID | None, exact: bool, ef_search: int | None, probes: int | None
+) -> tuple[list[UUID], float]:
+    if exact:
+        # Full-precision distances, whatever the index stores.
+        statement = select(DocumentChunk.id).order_by(DocumentChunk.embedding.cosine_distance(query)).limit(k)
+        if thread_id is not None:
+            statement = statement.where(DocumentChunk.thread_id == thread_id)
+    else:
+        statement = nearest_chunks_statement(query, k, thread_id=thread_id)
+    async with async_session() as session:
+        if exact:
+            await session.execute(text("SET LOCAL enable_indexscan = off"))
+        else:
+            await set_search_parameters(session, ef_search=ef_search, probes=probes)
+        started = time.perf_counter()
+        rows = (await session.execute(statement)).scalars()
+        ids = [row if exact else row.id for row in rows]
+        return ids, (time.perf_counter() - started) * 1000
+
+
+def _p95(values: list[float]) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * 0.95) - 1, 0)]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.01, help="Standard deviation added to sampled vectors")
+    parser.add_argument("--thread-id", type=UUID, help="Search the chunks of one thread only")
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[10, 20, 40, 100, 200], help="HNSW values")
+    parser.add_argument("--probes", type=int, nargs="*", default=[1, 5, 10, 20, 50], help="IVFFlat values")
+    args = parser.parse_args()
+
+    queries = await _sample_queries(args.queries, args.noise, args.thread_id)
+    if not queries:
+        print("No chunks to query, index some documents first.")
+        return
+    exact_results, exact_latencies = [], []
+    for query in queries:
+        ids, latency = await _search(query, args.k, args.thread_id, True, None, None)
+        exact_results.append(set(ids))
+        exact_latencies.append(latency)
+
+    print(f"{len(queries)} queries, k={args.k}, index: {index_signature()}")
+    print(f"{'search':<20}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'exact':<20}{1:>10.3f}{statistics.median(exact_latencies):>10.2f}{_p95(exact_latencies):>10.2f}")
+
+    if settings.vector_index_type == "hnsw":
+        variants = [(f"ef_search={value}", value, None) for value in args.ef_search]
+    elif settings.vector_index_type == "ivfflat":
+        variants = [(f"probes={value}", None, value) for value in args.probes]
+    else:
+        variants = []
+    for label, ef_search, probes in variants:
+        recalls, latencies = [], []
+        for query, exact in zip(queries, exact_results):
+            ids, latency = await _search(query, args.k, args.thread_id, False, ef_search, probes)
+            recalls.append(len(exact.intersection(ids)) / len(exact) if exact else 1.0)
+            latencies.append(latency)
+        recall, p50 = statistics.mean(recalls), statistics.median(latencies)
+        print(f"{label:<20}{recall:>10.3f}{p50:>10.2f}{_p95(latencies):>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
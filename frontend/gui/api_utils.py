@@ -379,7 +379,7 @@ def upload_document(thread_id: UUID, file: UploadedFile) -> dict | None:
         return response.json()
     except requests.exceptions.HTTPError as e:
         logger.error(f"Upload failed with status {e.response.status_code}. Response: {e.response.text}")
-        if e.response.status_code in [400, 401]:
+        if e.response.status_code in [400, 401, 413]:
             return e.response.json()
         return {}
     except requests.exceptions.RequestException as e:
@@ -390,6 +390,76 @@ def upload_document(thread_id: UUID, file: UploadedFile) -> dict | None:
         return None
 
 
+def upload_documents(thread_id: UUID, files: list[UploadedFile]) -> list[dict] | None:
+    """
+    Uploads several documents to the API in one request, they are stored and indexed concurrently.
+
+    Args:
+        files: The UploadedFile objects from Streamlit.
+
+    Returns:
+        A list with one result per file (file_name, status_code, document_id, job_id, status, message)
+        if successful, or None otherwise.
+    """
+
+    headers = {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {st.session_state['user'].access_token}",
+    }
+
+    logger.info(f"Starting batch upload of {len(files)} files.")
+    try:
+        upload_files = [("files", (file.name, file.getvalue(), file.type)) for file in files]
+
+        response = requests.post(
+            f"{BASE_URL}/documents/upload/{thread_id}/batch", files=upload_files, headers=headers, timeout=TIMEOUT
+        )
+        response.raise_for_status()
+
+        logger.info(f"Successfully uploaded {len(files)} files.")
+        return response.json()["results"]
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"Batch upload failed with status {e.response.status_code}. Response: {e.response.text}")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Batch upload failed with RequestError: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Batch upload failed with an unexpected exception: {str(e)}")
+        return None
+
+
+def get_ingestion_job(job_id: str) -> dict | None:
+    """
+    Retrieves the status and progress of a document ingestion job from the API.
+
+    Args:
+        job_id: The ID of the ingestion job returned by the upload endpoint.
+
+    Returns:
+        A dictionary containing the job status if successful, or None otherwise.
+    """
+
+    headers = {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {st.session_state['user'].access_token}",
+    }
+
+    try:
+        response = requests.get(f"{BASE_URL}/documents/jobs/{job_id}", headers=headers, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"Get ingestion job failed with status {e.response.status_code}. Response: {e.response.text}")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Get ingestion job failed with RequestError: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Get ingestion job failed with an unexpected exception: {str(e)}")
+        return None
+
+
 def list_document(thread_id: UUID) -> list | None:
     """
     Retrieves the list of documents from the API.
@@ -1,11 +1,25 @@
 import asyncio
 import json
+import time
 
 import api_utils
 import streamlit as st
 from loguru import logger
 from state_management import new_chat, update_document_list, update_thread, update_user_threads
 
+INGESTION_POLL_INTERVAL = 1
+INGESTION_WAIT_TIMEOUT = 300
+
+
+def wait_for_ingestion(job_id: str) -> dict | None:
+    """Poll an ingestion job until it completes, fails or the wait timeout is reached."""
+    deadline = time.monotonic() + INGESTION_WAIT_TIMEOUT
+    job = api_utils.get_ingestion_job(job_id)
+    while job and job["status"] in ["pending", "running"] and time.monotonic() < deadline:
+        time.sleep(INGESTION_POLL_INTERVAL)
+        job = api_utils.get_ingestion_job(job_id)
+    return job
+
 
 def authenticated_user_chat_interface_component():
     is_first_message = False
@@ -37,13 +51,34 @@ def authenticated_user_chat_interface_component():
             for up in files:
                 st.write(f"📂 {up.name}")
 
-        for file in files:
-            with st.spinner(f"Uploading {file.name}…"):
-                resp = api_utils.upload_document(st.session_state["thread"].id, file)
-                if resp:
-                    st.success(f"Uploaded {file.name} ➝ ID {resp['document_id']}")
-                else:
-                    st.error(f"Failed to upload {file.name}")
+        uploads: list[tuple[str, dict | None]] = []
+        if len(files) == 1:
+            with st.spinner(f"Uploading {files[0].name}…"):
+                uploads.append((files[0].name, api_utils.upload_document(st.session_state["thread"].id, files[0])))
+        elif files:
+            with st.spinner(f"Uploading {len(files)} files…"):
+                results = api_utils.upload_documents(st.session_state["thread"].id, files)
+            if results is None:
+                uploads = [(file.name, None) for file in files]
+            else:
+                uploads = [(result["file_name"], result if result["document_id"] else None) for result in results]
+
+        # The files are indexed in parallel by the worker, so waiting on them in turn takes as long as the slowest.
+        for file_name, resp in uploads:
+            if not resp or "job_id" not in resp:
+                st.error(f"Failed to upload {file_name}")
+                continue
+
+            job = resp
+            if resp["job_id"] is not None:
+                with st.spinner(f"Indexing {file_name}…"):
+                    job = wait_for_ingestion(resp["job_id"])
+            if job and job["status"] == "completed":
+                st.success(f"Uploaded {file_name} ➝ ID {resp['document_id']}")
+            elif job and job["status"] == "failed":
+                st.error(f"Failed to index {file_name}: {job['error']}")
+            else:
+                st.info(f"{file_name} is still being indexed in the background.")
 
         if files:
             update_document_list(st.session_state["thread"].id)